@@ -0,0 +1,30 @@
+import time
+
+
+class AnalysisTimeout(Exception):
+    """页面分析超过时间预算"""
+
+
+class Deadline:
+    """单个页面分析的时间预算（协作式）
+
+    分析过程在每个脚本块、JSSource的扫描/查找循环中、每个postMessage调用/处理函数以及
+    每条规则执行前调用check()，超时后抛出AnalysisTimeout，由检测器把页面标记为部分结果。
+    单次正则匹配无法中断，因此规则本身需保证线性时间（见rules.Rule的anchor）；分析结束时
+    已超时的页面同样标记为部分结果。seconds为0或None表示不限制。
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.perf_counter() + seconds if seconds else None
+
+    def remaining(self):
+        """剩余秒数（不小于0），不限制时返回None"""
+        return None if self.expires is None else max(self.expires - time.perf_counter(), 0)
+
+    def expired(self):
+        return self.expires is not None and time.perf_counter() > self.expires
+
+    def check(self):
+        if self.expired():
+            raise AnalysisTimeout(f"超过页面分析时间预算 {self.seconds}s")
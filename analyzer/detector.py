@@ -1,117 +1,200 @@
-import re
+from urllib.parse import urljoin
 from .parser import PageParser
+from .findings_cache import script_fingerprint
+from .deadline import Deadline, AnalysisTimeout
+from .prefilter import has_keywords, record_page
+from .metrics import timer
+from .rules import (WILDCARD_TARGET_ORIGIN, DYNAMIC_TARGET_ORIGIN, UNTRUSTED_DATA_SOURCE, ORIGIN_CHECK,
+                    WEAK_ORIGIN_RULES, DANGEROUS_SINK_RULES)
+from config import SCAN_CONFIG
 
 
 class PostMessageVulnerabilityDetector:
-    def __init__(self, url, html_content):
+    def __init__(self, url, html_content, script_cache=None, findings_cache=None, parser=None):
         self.url = url
-        self.parser = PageParser(html_content)
+        self.deadline = Deadline(SCAN_CONFIG["page_analysis_budget"])
+        if parser is None:
+            # 页面中没有任何关键字时不分析内联脚本，只在需要外部脚本时用stream后端取<script src>（不构建DOM树）
+            with timer("prefilter"):
+                skipped = not has_keywords(html_content)
+            record_page(html_content, skipped)
+            if skipped:
+                parser = PageParser(html_content if script_cache else '', backend='stream')
+                parser.script_blocks.clear()  # 脚本块不含关键字，无需再逐块检查
+        self.parser = parser or PageParser(html_content)
+        self.parser.deadline = self.deadline
+        self.partial = False  # 超过时间预算，结果不完整
+        self.script_cache = script_cache  # 传入ScriptCache时同时分析外部脚本
+        self.findings_cache = findings_cache  # 传入FindingsCache时复用相同脚本/处理函数的检测结果
+        self.unit_misses = 0
         self.vulnerabilities = []
-        # 常见的不安全origin验证模式
-        self.insecure_origin_patterns = [
-            r'event\.origin\.indexOf\(["\'].*?["\']\)',  # 包含匹配
-            r'event\.origin\s*==?\s*["\']http',         # 不完整协议匹配
-            r'event\.origin\s*!=?\s*["\']',             # 仅否定检查
-            r'[^!]event\.origin'                        # 无验证逻辑
-        ]
 
     def analyze(self):
-        """增强分析逻辑：检查postMessage调用和处理全链路"""
-        if not self.parser.has_post_message():
-            return self.vulnerabilities
+        """增强分析逻辑：检查postMessage调用和处理全链路
 
-        # 分析postMessage调用（增加data参数来源检查）
+        超过时间预算时停止分析，返回已发现的漏洞，并设置self.partial标记结果不完整
+        （不作为漏洞返回：不计入漏洞数，也不参与验证）。
+        """
+        try:
+            if self.parser.has_post_message():
+                # 分析postMessage调用和message事件处理（相同脚本复用缓存的结果）
+                self._analyze_scripts()
+                # 分析iframe嵌套中的postMessage
+                self._analyze_iframe_contexts()
+
+            # 分析<script src>引用的外部脚本（每个脚本整个扫描只分析一次）
+            if self.script_cache:
+                with timer("external_scripts"):  # 包括下载和其中各阶段的耗时
+                    self._analyze_external_scripts()
+        except AnalysisTimeout:
+            self.partial = True
+        # 最后一步（如单次正则匹配）无法中断，分析结束时已超时的页面同样标记为部分结果
+        if self.deadline.expired():
+            self.partial = True
+
+        return self.vulnerabilities
+
+    def _analyze_scripts(self):
+        cache = self.findings_cache
+        if cache is None:
+            # 分析postMessage调用（增加data参数来源检查）
+            self._analyze_post_message_calls()
+            # 分析message事件处理（增强origin验证和data处理检查）
+            self._analyze_message_handlers()
+            return
+
+        # 模板化页面的脚本往往完全相同：整页命中时连解析处理函数和执行规则都不用做
+        with timer("findings_cache_lookup"):
+            page_key = script_fingerprint(self.parser.scripts)
+            cached = cache.lookup_page(page_key)
+        if cached is not None:
+            self.vulnerabilities.extend(cached)
+            return
+        start = len(self.vulnerabilities)
+        self.unit_misses = 0
         self._analyze_post_message_calls()
-        # 分析message事件处理（增强origin验证和data处理检查）
         self._analyze_message_handlers()
-        # 分析iframe嵌套中的postMessage
-        self._analyze_iframe_contexts()
+        cache.store_page(page_key, self.vulnerabilities[start:], self.unit_misses == 0)
 
-        return self.vulnerabilities
+    def _cached_findings(self, key, check):
+        """单个postMessage调用或message处理函数的检测结果，缓存命中时不再执行规则"""
+        if self.findings_cache is None:
+            return check()
+        findings = self.findings_cache.lookup_unit(key)
+        if findings is None:
+            self.unit_misses += 1
+            findings = check()
+            self.findings_cache.store_unit(key, findings)
+        return findings
 
     def _analyze_post_message_calls(self):
         calls = self.parser.get_post_message_calls()
-        for call in calls:
-            data_param, target_origin = call
-
-            # 检测targetOrigin="*"
-            if re.search(r'["\']\*["\']', target_origin):
-                self.vulnerabilities.append({
-                    'type': 'insecure_postmessage',
-                    'description': 'postMessage使用了不安全的targetOrigin="*"，允许向任何域发送消息',
-                    'code_snippet': f'postMessage({data_param}, {target_origin})',
-                    'severity': 'high',
-                    'hint': '可能利用场景：跨域发送恶意数据到未验证origin的接收方'
-                })
+        with timer("check_calls"):
+            for data_param, target_origin in calls:
+                self.deadline.check()
+                key = script_fingerprint(f'postMessage({data_param}, {target_origin})')
+                self.vulnerabilities.extend(
+                    self._cached_findings(key, lambda: self._check_post_message_call(data_param, target_origin))
+                )
 
-            # 检查targetOrigin动态控制
-            if re.search(r'location\.href|document\.referrer|window\.origin', target_origin, re.IGNORECASE):
-                self.vulnerabilities.append({
-                    'type': 'dynamic_target_origin',
-                    'description': 'postMessage的targetOrigin由动态值控制，可能被篡改',
-                    'code_snippet': f'postMessage({data_param}, {target_origin})',
-                    'severity': 'medium'
-                })
+    def _check_post_message_call(self, data_param, target_origin):
+        findings = []
 
-            # 检查data参数是否来自不可信源
-            if re.search(r'location\.hash|document\.cookie|window\.name|localStorage', data_param, re.IGNORECASE):
-                self.vulnerabilities.append({
-                    'type': 'untrusted_data_source',
-                    'description': 'postMessage的data参数来自不可信源（如URL哈希、cookie）',
-                    'code_snippet': f'postMessage({data_param}, {target_origin})',
-                    'severity': 'medium'
-                })
+        # 检测targetOrigin="*"
+        if WILDCARD_TARGET_ORIGIN.search(target_origin):
+            findings.append({
+                'type': 'insecure_postmessage',
+                'description': 'postMessage使用了不安全的targetOrigin="*"，允许向任何域发送消息',
+                'code_snippet': f'postMessage({data_param}, {target_origin})',
+                'severity': 'high',
+                'hint': '可能利用场景：跨域发送恶意数据到未验证origin的接收方'
+            })
+
+        # 检查targetOrigin动态控制
+        if DYNAMIC_TARGET_ORIGIN.search(target_origin):
+            findings.append({
+                'type': 'dynamic_target_origin',
+                'description': 'postMessage的targetOrigin由动态值控制，可能被篡改',
+                'code_snippet': f'postMessage({data_param}, {target_origin})',
+                'severity': 'medium'
+            })
+
+        # 检查data参数是否来自不可信源
+        if UNTRUSTED_DATA_SOURCE.search(data_param):
+            findings.append({
+                'type': 'untrusted_data_source',
+                'description': 'postMessage的data参数来自不可信源（如URL哈希、cookie）',
+                'code_snippet': f'postMessage({data_param}, {target_origin})',
+                'severity': 'medium'
+            })
+        return findings
 
     def _analyze_message_handlers(self):
         handlers = self.parser.get_message_event_handlers()
-        for handler in handlers:
-            # 检查origin验证
-            if not re.search(r'event\.origin', handler, re.IGNORECASE):
-                self.vulnerabilities.append({
-                    'type': 'missing_origin_check',
-                    'description': 'message事件处理未验证event.origin，可能接收恶意消息',
-                    'severity': 'high',
-                    'fix建议': '使用精确匹配验证event.origin，如event.origin === "https://trusted.com"'
+        with timer("check_handlers"):
+            for handler in handlers:
+                self.deadline.check()
+                fingerprint = script_fingerprint(handler)
+                self.vulnerabilities.extend(
+                    self._cached_findings(fingerprint, lambda: self._check_message_handler(handler, fingerprint))
+                )
+
+    def _check_message_handler(self, handler, fingerprint):
+        """检查单个message处理函数，漏洞中记录处理函数指纹（相同处理函数的漏洞可合并验证）"""
+        findings = []
+
+        # 检查origin验证
+        if not ORIGIN_CHECK.search(handler):
+            findings.append({
+                'type': 'missing_origin_check',
+                'description': 'message事件处理未验证event.origin，可能接收恶意消息',
+                'severity': 'high',
+                'fix建议': '使用精确匹配验证event.origin，如event.origin === "https://trusted.com"'
+            })
+        else:
+            # 检测不安全的origin验证模式
+            for rule, match in WEAK_ORIGIN_RULES.scan(handler, self.deadline):
+                findings.append({
+                    'type': 'weak_origin_check',
+                    'description': 'message事件使用宽松的origin验证（如indexOf包含匹配）',
+                    'code_snippet': match.group(0),
+                    'severity': 'medium',
+                    'fix建议': '使用严格的精确相等比较（===）验证origin'
                 })
-            else:
-                # 检测不安全的origin验证模式
-                for pattern in self.insecure_origin_patterns:
-                    if re.search(pattern, handler, re.IGNORECASE | re.DOTALL):
-                        self.vulnerabilities.append({
-                            'type': 'weak_origin_check',
-                            'description': 'message事件使用宽松的origin验证（如indexOf包含匹配）',
-                            'code_snippet': re.search(pattern, handler, re.IGNORECASE | re.DOTALL).group(0),
-                            'severity': 'medium',
-                            'fix建议': '使用严格的精确相等比较（===）验证origin'
-                        })
-
-            # 检查data处理是否存在危险操作
-            dangerous_ops = [
-                (r'document\.write\s*\(.*event\.data.*\)', '使用document.write插入未经处理的消息数据'),
-                (r'innerHTML\s*=.*event\.data', '使用innerHTML插入未经处理的消息数据'),
-                (r'eval\s*\(.*event\.data.*\)', '使用eval执行消息数据'),
-                (r'new Function\(.*event\.data.*\)', '使用new Function执行消息数据'),
-                (r'location\s*=.*event\.data', '将消息数据用于页面跳转')
-            ]
-            for pattern, desc in dangerous_ops:
-                if re.search(pattern, handler, re.IGNORECASE | re.DOTALL):
-                    self.vulnerabilities.append({
-                        'type': 'unsafe_data_handling',
-                        'description': f'message事件处理存在危险操作：{desc}',
-                        'code_snippet': re.search(pattern, handler, re.IGNORECASE | re.DOTALL).group(0),
-                        'severity': 'high',
-                        'fix建议': '对event.data进行严格过滤和转义，避免直接用于DOM操作或代码执行'
-                    })
+
+        # 检查data处理是否存在危险操作
+        for rule, match in DANGEROUS_SINK_RULES.scan(handler, self.deadline):
+            findings.append({
+                'type': 'unsafe_data_handling',
+                'description': f'message事件处理存在危险操作：{rule.description}',
+                'code_snippet': match.group(0),
+                'severity': 'high',
+                'fix建议': '对event.data进行严格过滤和转义，避免直接用于DOM操作或代码执行'
+            })
+
+        for finding in findings:
+            finding['handler_fingerprint'] = fingerprint
+        return findings
 
     def _analyze_iframe_contexts(self):
         """分析iframe中的postMessage交互"""
-        iframes = self.parser.soup.find_all('iframe')
-        for iframe in iframes:
-            src = iframe.get('src', '')
-            if src:
-                self.vulnerabilities.append({
-                    'type': 'iframe_interaction',
-                    'description': f'页面包含iframe（{src}），可能存在跨帧postMessage交互风险',
-                    'severity': 'info',
-                    'hint': '需确认iframe与父页面间的消息传递是否安全'
-                })
\ No newline at end of file
+        for src in self.parser.iframe_srcs:
+            self.vulnerabilities.append({
+                'type': 'iframe_interaction',
+                'description': f'页面包含iframe（{src}），可能存在跨帧postMessage交互风险',
+                'severity': 'info',
+                'hint': '需确认iframe与父页面间的消息传递是否安全'
+            })
+
+    def _analyze_external_scripts(self):
+        """外部脚本的漏洞附加到当前页面，并标注来源脚本"""
+        script_urls = dict.fromkeys(urljoin(self.url, src) for src in self.parser.script_srcs)
+        for script_url in script_urls:
+            if not script_url.startswith(('http://', 'https://')):
+                continue
+            self.deadline.check()
+            findings, partial = self.script_cache.analyze(script_url)
+            if partial:
+                self.partial = True  # 外部脚本分析超时，页面结果同样不完整
+            for vuln in findings:
+                self.vulnerabilities.append(dict(vuln, script_url=script_url))
\ No newline at end of file
@@ -0,0 +1,77 @@
+import hashlib
+import threading
+from utils import LRUCache
+from config import SCAN_CONFIG
+
+
+def script_fingerprint(script):
+    """脚本/处理函数的指纹：原始文本的blake2b哈希
+
+    不折叠空白：部分规则对空白敏感（如new Function\\(要求单个空格、[^!]event\\.origin看前一个字符），
+    代码片段也取自原文，仅空白不同的代码检测结果可能不同。
+    """
+    return hashlib.blake2b(script.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+class FindingsCache:
+    """检测结果缓存（LRU），整个扫描共享
+
+    两级缓存：页面级以页面全部脚本的指纹为键，命中时跳过提取和规则；
+    单元级以单个postMessage调用或message处理函数的指纹为键，命中时跳过规则。
+    缓存中保存的是漏洞字典的副本，取出时也返回副本，后续写入的验证结果不会污染缓存。
+    """
+
+    def __init__(self, max_entries=None):
+        max_entries = max_entries or SCAN_CONFIG["findings_cache_max_entries"]
+        self.pages = LRUCache(max_entries)
+        self.units = LRUCache(max_entries)
+        self.lock = threading.Lock()
+        self.stats = {"pages": 0, "page_hits": 0, "unit_served_pages": 0, "unit_hits": 0, "unit_misses": 0}
+
+    @staticmethod
+    def _copy(findings):
+        return [dict(finding) for finding in findings]
+
+    def lookup_page(self, key):
+        findings = self.pages.get(key)
+        with self.lock:
+            self.stats["pages"] += 1
+            if findings is not None:
+                self.stats["page_hits"] += 1
+        return self._copy(findings) if findings is not None else None
+
+    def store_page(self, key, findings, all_units_cached):
+        """保存页面结果；all_units_cached表示该页所有调用和处理函数都命中了单元级缓存"""
+        self.pages.put(key, self._copy(findings))
+        if all_units_cached:
+            with self.lock:
+                self.stats["unit_served_pages"] += 1
+
+    def lookup_unit(self, key):
+        findings = self.units.get(key)
+        with self.lock:
+            self.stats["unit_hits" if findings is not None else "unit_misses"] += 1
+        return self._copy(findings) if findings is not None else None
+
+    def store_unit(self, key, findings):
+        self.units.put(key, self._copy(findings))
+
+    def raw_stats(self):
+        """原始计数（可跨进程汇总）"""
+        return dict(self.stats, evictions=self.pages.evictions + self.units.evictions)
+
+    @staticmethod
+    def format_stats(stats):
+        served = stats["page_hits"] + stats["unit_served_pages"]
+        return {
+            "分析的页面数(含postMessage)": stats["pages"],
+            "整页命中缓存": stats["page_hits"],
+            "处理函数全部命中缓存": stats["unit_served_pages"],
+            "由缓存提供结果的页面": f"{served} ({served / max(stats['pages'], 1):.1%})",
+            "处理函数/调用缓存命中": stats["unit_hits"],
+            "处理函数/调用缓存未命中": stats["unit_misses"],
+            "缓存淘汰数": stats["evictions"],
+        }
+
+    def get_stats(self):
+        return self.format_stats(self.raw_stats())
@@ -0,0 +1,388 @@
+import itertools
+import re
+from bisect import bisect_right
+
+STRING = r'"[^"\\\n]*(?:\\[\s\S][^"\\\n]*)*"|\'[^\'\\\n]*(?:\\[\s\S][^\'\\\n]*)*\''
+COMMENT = r'//[^\n]*|/\*[\s\S]*?(?:\*/|\Z)'
+# 下一个字符串或注释（整体跳过），或可能开始模板、正则字面量的字符；其余字符都是普通代码
+SPECIAL = re.compile(rf'(?P<skip>{STRING}|{COMMENT})|[`/"\']')
+# 模板替换表达式 ${{...}} 内还需要跟踪花括号以找到替换表达式的结尾
+SUBSTITUTION_SPECIAL = re.compile(rf'(?P<skip>{STRING}|{COMMENT})|[`/"\'{{}}]')
+TEMPLATE_CHUNK = re.compile(r'[^`\\$]*(?:(?:\\[\s\S]|\$(?!\{))[^`\\$]*)*')
+REGEX_LITERAL = re.compile(r'/(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[A-Za-z]*')
+WHITESPACE = re.compile(r'\s*')
+BRACKETS = re.compile(r'[(){}\[\]]')
+ARG_DELIMITERS = re.compile(r'[(){}\[\],]')
+EXPRESSION_DELIMITERS = re.compile(r'[(){}\[\];,\n]')
+MESSAGE_TYPE = re.compile(r'(["\'`])message\1')
+FUNCTION_START = re.compile(r'(?:async\b\s*)?(?:function\b|\(|[\w$]+\s*=>)')
+FUNCTION_HEAD = re.compile(r'\s*\*?\s*[\w$]*\s*\(')
+HANDLER_NAME = re.compile(r'(?:[\w$]+\s*\.\s*)*([\w$]+)\s*(?:\.\s*bind\s*\([\s\S]*\))?')
+
+# 出现在这些关键字之后的 / 是正则字面量而不是除号
+REGEX_KEYWORDS = frozenset((
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'case', 'do', 'else', 'yield', 'await'
+))
+
+# 扫描循环每迭代这么多次检查一次时间预算
+CHECK_INTERVAL = 256
+
+
+def _is_identifier_char(char):
+    return char.isalnum() or char in '_$'
+
+
+def is_function_expression(code):
+    """是否为函数表达式（function/箭头函数/括号包裹的表达式），而不是函数名引用"""
+    return FUNCTION_START.match(code) is not None
+
+
+def handler_name(code):
+    """从 handleMessage / this.onMessage / obj.fn.bind(this) 中取出函数名"""
+    match = HANDLER_NAME.fullmatch(code.strip())
+    return match.group(1) if match else None
+
+
+class JSSource:
+    """线性时间的JavaScript词法扫描
+
+    只扫描一遍源码，识别字符串、模板字符串（含嵌套的${}）、注释和正则字面量，记录这些
+    非代码区间；之后的查找（标识符、括号配对、参数切分）都会跳过非代码区间，
+    因此字符串或注释中的"postMessage("、括号、逗号不会干扰结果，嵌套的花括号也能正确配对。
+    deadline为页面分析的时间预算，扫描和查找的循环中检查，超时抛出AnalysisTimeout。
+    """
+
+    def __init__(self, text, deadline=None):
+        self.text = text
+        self.deadline = deadline
+        self.skip_starts = []  # 非代码区间（字符串/模板/注释/正则字面量）的起点，按位置有序
+        self.skip_ends = []
+        self.pairs = None  # 开括号位置 -> 闭括号位置（第一次需要时一次性计算）
+        self._scan()
+
+    def _skip(self, start, end):
+        self.skip_starts.append(start)
+        self.skip_ends.append(end)
+
+    def _check(self, count):
+        """循环中每CHECK_INTERVAL次迭代检查一次时间预算（每次都检查的开销接近扫描本身）"""
+        if self.deadline and not count % CHECK_INTERVAL:
+            self.deadline.check()
+
+    def _scan(self):
+        text = self.text
+        pos = 0
+        substitutions = []  # 每层未闭合的 ${ 内部的花括号深度
+        for count in itertools.count():
+            self._check(count)
+            match = (SUBSTITUTION_SPECIAL if substitutions else SPECIAL).search(text, pos)
+            if not match:
+                break
+            pos = match.start()
+            if match.lastgroup:
+                # 字符串或注释
+                self._skip(pos, match.end())
+                pos = match.end()
+                continue
+            char = text[pos]
+            if char == '{':
+                substitutions[-1] += 1
+                pos += 1
+            elif char == '}':
+                if substitutions[-1] == 0:
+                    substitutions.pop()
+                    pos = self._template(pos, substitutions)
+                else:
+                    substitutions[-1] -= 1
+                    pos += 1
+            elif char == '`':
+                pos = self._template(pos, substitutions)
+            elif char != '/':
+                pos += 1  # 未闭合的引号，按普通字符处理
+            else:
+                # 正则字面量或除号
+                match = REGEX_LITERAL.match(text, pos) if self._regex_allowed(pos) else None
+                if match:
+                    self._skip(pos, match.end())
+                    pos = match.end()
+                else:
+                    pos += 1
+
+    def _template(self, pos, substitutions):
+        """从反引号或替换表达式结尾的 } 开始扫描模板文本，遇到 ${ 时进入替换表达式"""
+        text = self.text
+        end = TEMPLATE_CHUNK.match(text, pos + 1).end()
+        if text.startswith('${', end):
+            self._skip(pos, end + 2)
+            substitutions.append(0)
+            return end + 2
+        end = min(end + 1, len(text))  # 结尾的反引号（未闭合时到文本末尾）
+        self._skip(pos, end)
+        return end
+
+    def _regex_allowed(self, pos):
+        """根据 / 前一个有效字符判断它是正则字面量的开始还是除号（只在遇到 / 时向前回看）"""
+        text = self.text
+        i = pos - 1
+        span = len(self.skip_starts) - 1  # 已记录的非代码区间都在pos之前
+        while True:
+            while i >= 0 and text[i].isspace():
+                i -= 1
+            if i < 0:
+                return True
+            if span >= 0 and self.skip_ends[span] == i + 1:
+                span_start = self.skip_starts[span]
+                if text.startswith('/', span_start) and text[span_start + 1] in '/*':
+                    i = span_start - 1  # 注释：继续向前
+                    span -= 1
+                    continue
+                # 字符串、模板、正则字面量之后是除号；模板的 ${ 之后是表达式的开始
+                return text.startswith('${', i - 1) and text[span_start] in '`}'
+            break
+        last = text[i]
+        if last in ')]':
+            return False
+        if _is_identifier_char(last):
+            end = i + 1
+            while i >= 0 and _is_identifier_char(text[i]):
+                i -= 1
+            return text[i + 1:end] in REGEX_KEYWORDS
+        return True
+
+    def _skip_end(self, pos):
+        """pos位于非代码区间内时返回该区间的结尾，否则返回None"""
+        index = bisect_right(self.skip_starts, pos) - 1
+        if index >= 0 and pos < self.skip_ends[index]:
+            return self.skip_ends[index]
+        return None
+
+    def is_code(self, pos):
+        return self._skip_end(pos) is None
+
+    def find_identifier(self, name):
+        """代码中（不含字符串和注释）出现的标识符位置"""
+        text = self.text
+        pos = text.find(name)
+        count = 0
+        while pos >= 0:
+            self._check(count)
+            count += 1
+            end = pos + len(name)
+            if (pos == 0 or not _is_identifier_char(text[pos - 1])) and \
+                    (end == len(text) or not _is_identifier_char(text[end])) and \
+                    self._skip_end(pos) is None:
+                yield pos
+            pos = text.find(name, end)
+
+    def next_significant(self, pos):
+        """跳过空白和注释，返回下一个有效字符的位置"""
+        text = self.text
+        while True:
+            pos = WHITESPACE.match(text, pos).end()
+            if text.startswith(('//', '/*'), pos):
+                end = self._skip_end(pos)
+                if end is not None:
+                    pos = end
+                    continue
+            return pos
+
+    def _bracket_pairs(self):
+        """一次遍历所有代码区间，用栈配对全部括号（第一次需要时计算）
+
+        模板中 ${ 开启的替换表达式也入栈（以 ${ 中 { 的位置为键），与替换表达式结尾的 } 配对。
+        闭括号总是与最近一个未配对的开括号配对，不检查括号类型；之后的查询都是O(1)的字典查找。
+        """
+        if self.pairs is not None:
+            return self.pairs
+        text = self.text
+        pairs = {}
+        stack = []
+        pos = 0
+        for count, (start, end) in enumerate(zip(self.skip_starts + [len(text)], self.skip_ends + [len(text)])):
+            self._check(count)
+            for match in BRACKETS.finditer(text, pos, start):
+                p = match.start()
+                if text[p] in '({[':
+                    stack.append(p)
+                elif stack:
+                    pairs[stack.pop()] = p
+            if start < len(text) and text[start] in '`}':
+                if text[start] == '}' and stack:
+                    pairs[stack.pop()] = start  # 替换表达式结束
+                if text.startswith('${', end - 2):
+                    stack.append(end - 1)  # 开启新的替换表达式
+            pos = end
+        self.pairs = pairs
+        return pairs
+
+    def match_bracket(self, open_pos):
+        """返回与open_pos处的开括号配对的闭括号位置，找不到返回None"""
+        return self._bracket_pairs().get(open_pos)
+
+    def _next_delimiter(self, pattern, pos, endpos):
+        """同一层级中pattern匹配的下一个位置（跳过非代码区间，括号和模板替换表达式按配对位置整体跳过）
+
+        遇到没有配对的开括号或替换表达式时，表达式延续到文本末尾，返回None。
+        """
+        text = self.text
+        pairs = self._bracket_pairs()
+        for count in itertools.count():
+            self._check(count)
+            match = pattern.search(text, pos, endpos)
+            if not match:
+                return None
+            p = match.start()
+            end = self._skip_end(p)
+            if end is not None:
+                if text[self.skip_starts[bisect_right(self.skip_starts, p) - 1]] in '`}' and \
+                        text.startswith('${', end - 2):
+                    pos = pairs.get(end - 1)  # 跳到替换表达式结尾的 }（其后的模板片段继续处理）
+                    if pos is None:
+                        return None
+                else:
+                    pos = end
+                continue
+            if text[p] in '({[':
+                close_pos = pairs.get(p)
+                if close_pos is None:
+                    return None
+                pos = close_pos + 1
+                continue
+            return p
+
+    def call_args(self, pos):
+        """pos之后紧跟 ( 时返回各参数的源码（已去除首尾空白），否则返回None"""
+        open_pos = self.next_significant(pos)
+        if not self.text.startswith('(', open_pos):
+            return None
+        close_pos = self.match_bracket(open_pos)
+        if close_pos is None:
+            return None
+        text = self.text
+        args = []
+        start = pos = open_pos + 1
+        while True:
+            p = self._next_delimiter(ARG_DELIMITERS, pos, close_pos)
+            if p is None:
+                break
+            if text[p] == ',':
+                args.append(text[start:p].strip())
+                start = p + 1
+            pos = p + 1
+        last = text[start:close_pos].strip()
+        if last or args:
+            args.append(last)
+        return args
+
+    def expression_end(self, start):
+        """表达式的结尾：同一层级遇到 ; , 换行或外层闭括号为止（括号内的内容整体跳过）
+
+        函数表达式先整体跳过参数列表和函数体，因此 function(e)\n{...} 这类换行写法不会在参数列表后截断。
+        """
+        end = self._next_delimiter(EXPRESSION_DELIMITERS, self._function_end(start), len(self.text))
+        return len(self.text) if end is None else end
+
+    def _function_end(self, start):
+        """start处是函数表达式时返回其参数列表（或箭头）和函数体之后的位置，否则返回start"""
+        text = self.text
+        match = FUNCTION_START.match(text, self.next_significant(start))
+        if not match:
+            return start
+        if text[match.end() - 1] == '(':
+            # (params) => body，或括号包裹的表达式
+            close_pos = self.match_bracket(match.end() - 1)
+            if close_pos is None:
+                return start
+            arrow = self.next_significant(close_pos + 1)
+            if not text.startswith('=>', arrow):
+                return close_pos + 1
+            body = self.next_significant(arrow + 2)
+        elif text.startswith('=>', match.end() - 2):
+            body = self.next_significant(match.end())  # x => body
+        else:
+            # function name*(params) { body }
+            head = FUNCTION_HEAD.match(text, match.end())
+            close_pos = self.match_bracket(head.end() - 1) if head else None
+            if close_pos is None:
+                return start
+            body = self.next_significant(close_pos + 1)
+            if not text.startswith('{', body):
+                return start
+        if not text.startswith('{', body):
+            return body  # 箭头函数的表达式体按普通表达式处理
+        end = self.match_bracket(body)
+        return start if end is None else end + 1
+
+    def post_message_calls(self):
+        """所有postMessage调用的参数列表"""
+        calls = []
+        for pos in self.find_identifier('postMessage'):
+            args = self.call_args(pos + len('postMessage'))
+            if args is not None:
+                calls.append(args)
+        return calls
+
+    def message_listeners(self):
+        """addEventListener('message', handler) 中handler的源码"""
+        handlers = []
+        for pos in self.find_identifier('addEventListener'):
+            args = self.call_args(pos + len('addEventListener'))
+            if args and len(args) >= 2 and MESSAGE_TYPE.fullmatch(args[0]):
+                handlers.append(args[1])
+        return handlers
+
+    def onmessage_assignments(self):
+        """xxx.onmessage = handler 中handler的源码"""
+        text = self.text
+        values = []
+        for pos in self.find_identifier('onmessage'):
+            eq = self.next_significant(pos + len('onmessage'))
+            if text.startswith('=', eq) and not text.startswith(('==', '=>'), eq):
+                start = self.next_significant(eq + 1)
+                values.append(text[start:self.expression_end(start)].strip())
+        return values
+
+    def functions(self, name):
+        """名为name的函数定义源码：function name(){}、name = function/箭头函数、name: function(){}、方法简写 name(){}"""
+        text = self.text
+        found = []
+        for pos in self.find_identifier(name):
+            after = self.next_significant(pos + len(name))
+            keyword_start = self._function_keyword_before(pos)
+            if keyword_start is not None or (text.startswith('(', after) and not self._is_member(pos)):
+                # 函数声明或方法简写：参数列表后紧跟函数体
+                if not text.startswith('(', after):
+                    continue
+                close_pos = self.match_bracket(after)
+                if close_pos is None:
+                    continue
+                brace = self.next_significant(close_pos + 1)
+                if not text.startswith('{', brace):
+                    continue
+                end = self.match_bracket(brace)
+                if end is not None:
+                    found.append(text[pos if keyword_start is None else keyword_start:end + 1])
+            elif text.startswith(('=', ':'), after) and not text.startswith(('==', '=>'), after):
+                start = self.next_significant(after + 1)
+                if FUNCTION_START.match(text, start):
+                    found.append(text[start:self.expression_end(start)].strip())
+        return found
+
+    def _function_keyword_before(self, pos):
+        """name前面是function关键字（可带*）时返回关键字的起点"""
+        text = self.text
+        i = pos - 1
+        while i >= 0 and (text[i].isspace() or text[i] == '*'):
+            i -= 1
+        start = i - len('function') + 1
+        if start >= 0 and text.startswith('function', start) and (start == 0 or not _is_identifier_char(text[start - 1])):
+            return start
+        return None
+
+    def _is_member(self, pos):
+        """name前面是 . （即obj.name(...)形式的调用）"""
+        i = pos - 1
+        while i >= 0 and self.text[i].isspace():
+            i -= 1
+        return i >= 0 and self.text[i] == '.'
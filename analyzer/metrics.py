@@ -0,0 +1,101 @@
+import json
+import time
+
+# 本进程的阶段计时 {阶段名: [次数, 总耗时秒, 单次最大耗时秒]}
+_stages = {}
+_enabled = False
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stage = _stages.get(self.name)
+        if stage is None:
+            _stages[self.name] = [1, elapsed, elapsed]
+        else:
+            stage[0] += 1
+            stage[1] += elapsed
+            if elapsed > stage[2]:
+                stage[2] = elapsed
+        return False
+
+
+class _NullTimer:
+    """未启用时使用的空计时器（单例），with语句几乎没有开销"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """阶段计时：with timer("parse_stream"): ...；未启用时返回空计时器"""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def stage_counters():
+    """本进程的原始阶段计时（可跨进程汇总）"""
+    return {name: list(values) for name, values in _stages.items()}
+
+
+def merge_stage_counters(total, counters):
+    """把counters汇总到total中：次数和耗时相加，最大值取最大"""
+    for name, (count, elapsed, slowest) in counters.items():
+        stage = total.setdefault(name, [0, 0.0, 0.0])
+        stage[0] += count
+        stage[1] += elapsed
+        stage[2] = max(stage[2], slowest)
+    return total
+
+
+def get_stage_stats(counters):
+    """每个阶段的次数、总耗时、平均和最大耗时（按总耗时从高到低）"""
+    return {
+        name: f"{count} 次，共 {elapsed * 1000:.1f}ms，平均 {elapsed / count * 1000:.3f}ms，最大 {slowest * 1000:.1f}ms"
+        for name, (count, elapsed, slowest) in sorted(counters.items(), key=lambda item: -item[1][1])
+    }
+
+
+def write_metrics(path, stats):
+    """把汇总后的统计写成JSON文件，时间单位为毫秒"""
+    data = {
+        "stages": {
+            name: {"count": count, "total_ms": round(elapsed * 1000, 3),
+                   "avg_ms": round(elapsed / count * 1000, 4), "max_ms": round(slowest * 1000, 3)}
+            for name, (count, elapsed, slowest) in stats["stages"].items()
+        },
+        "rules": {
+            name: {"checks": checks, "runs": runs, "hits": hits, "elapsed_ms": round(elapsed * 1000, 3)}
+            for name, (checks, runs, hits, elapsed) in stats["rules"].items()
+        },
+        "prefilter": stats["prefilter"],
+        "findings_cache": stats["findings"],
+        "script_cache": stats["scripts"],
+        "slowest_pages": stats["slowest_pages"],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
@@ -1,17 +1,131 @@
-import re
+from html.parser import HTMLParser
 from bs4 import BeautifulSoup
-from utils import extract_js_functions
+from .jslexer import JSSource, is_function_expression, handler_name
+from .prefilter import has_keywords, record_block
+from .metrics import timer
+from config import SCAN_CONFIG
+
+# 与BeautifulSoup(html.parser)保持一致：空元素不入栈，pre/textarea内保留纯空白文本
+VOID_TAGS = frozenset((
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image',
+    'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source',
+    'spacer', 'track', 'wbr'
+))
+PRESERVE_WHITESPACE_TAGS = frozenset(('pre', 'textarea'))
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+class StreamCollector(HTMLParser):
+    """单遍扫描HTML（不构建DOM树），收集脚本内容、on*/href属性、外部脚本和iframe的src
+
+    与bs4后端使用同一个分词器（html.parser），并模拟bs4的属性去重和空白折叠规则，
+    因此提取结果与bs4后端完全一致。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)  # 与bs4相同，脚本文本按原样拼接
+        self.script_texts = []
+        self.handler_attrs = []
+        self.iframe_srcs = []
+        self.script_srcs = []
+        self.open_tags = []  # 简化的标签栈，只用于判断是否位于pre/textarea内
+        self.script_data = None  # 当前<script>内的文本片段
+
+    def handle_starttag(self, tag, attrs):
+        self._end_script()
+        values = {}
+        for name, value in attrs:
+            values[name] = '' if value is None else value  # 重复属性以最后一个为准
+        for name, value in values.items():
+            if name.startswith(('on', 'href')):
+                self.handler_attrs.append(value)
+        if tag == 'iframe' and values.get('src'):
+            self.iframe_srcs.append(values['src'])
+        if tag in VOID_TAGS:
+            return
+        self.open_tags.append(tag)
+        if tag == 'script':
+            if values.get('src'):
+                self.script_srcs.append(values['src'])
+            self.script_data = []
+
+    def handle_endtag(self, tag):
+        self._end_script()
+        if tag in self.open_tags:
+            # 与bs4相同：关闭最近一个同名标签及其内部未关闭的标签
+            index = len(self.open_tags) - 1 - self.open_tags[::-1].index(tag)
+            del self.open_tags[index:]
+
+    def handle_data(self, data):
+        if self.script_data is not None:
+            self.script_data.append(data)
+
+    def close(self):
+        super().close()
+        self._end_script()
+
+    def _end_script(self):
+        """<script>内的文本结束（遇到下一个标签或文档结束），对应bs4中script.string"""
+        if self.script_data is None:
+            return
+        text = ''.join(self.script_data)
+        self.script_data = None
+        if text and not text.strip(ASCII_SPACES) and not PRESERVE_WHITESPACE_TAGS.intersection(self.open_tags):
+            text = '\n' if '\n' in text else ' '
+        if text:
+            self.script_texts.append(text)
 
 
 class PageParser:
-    def __init__(self, html_content):
+    def __init__(self, html_content, backend=None):
         self.html = html_content
-        self.soup = BeautifulSoup(html_content, 'html.parser')
-        self.scripts = self._extract_scripts()
-        self.event_listeners = self._extract_event_listeners()
+        self.backend = backend or SCAN_CONFIG["parser_backend"]
+        self.deadline = None  # 页面分析的时间预算（由检测器设置），词法分析时检查
+        self._soup = None
+        if self.backend == 'bs4':
+            with timer("parse_bs4"):  # 包括构建BeautifulSoup
+                self._set_script_blocks(self._extract_scripts())
+                self.iframe_srcs = self._extract_iframe_srcs()
+                self.script_srcs = self._extract_script_srcs()
+        else:
+            # stream后端：一次扫描同时收集脚本、事件属性和iframe，不构建DOM树
+            with timer("parse_stream"):
+                collector = StreamCollector()
+                collector.feed(html_content)
+                collector.close()
+            self._set_script_blocks(collector.script_texts + collector.handler_attrs)
+            self.iframe_srcs = collector.iframe_srcs
+            self.script_srcs = collector.script_srcs
+
+    @classmethod
+    def from_script(cls, script):
+        """用外部脚本的内容构造解析器（没有HTML，只分析脚本本身）"""
+        parser = cls('', backend='stream')
+        parser._set_script_blocks([script])
+        return parser
+
+    def _set_script_blocks(self, blocks):
+        self.script_blocks = blocks
+        self._scripts = None
+        self._sources = {}  # 块序号 -> JSSource（按需构建）
+        self._js = None  # 词法分析结果（第一次查询时计算）
+
+    @property
+    def scripts(self):
+        """所有脚本块拼接成的整段脚本（按需拼接，只有页面含postMessage时才会用到）"""
+        if self._scripts is None:
+            self._scripts = '\n'.join(self.script_blocks)
+        return self._scripts
+
+    @property
+    def soup(self):
+        """完整的DOM树（按需构建，stream后端下只有访问时才解析）"""
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, 'html.parser')
+        return self._soup
 
     def _extract_scripts(self):
-        """提取所有JavaScript代码"""
+        """提取所有JavaScript代码块"""
         scripts = []
 
         # 提取<script>标签内容
@@ -25,51 +139,80 @@ class PageParser:
                 if attr.startswith(('on', 'href')):
                     scripts.append(tag[attr])
 
-        return '\n'.join(scripts)
+        return scripts
 
-    def _extract_event_listeners(self):
-        """提取所有事件监听器"""
-        pattern = re.compile(r'addEventListener\s*\(\s*["\']message["\']\s*,\s*([^,]+)\s*', re.IGNORECASE)
-        return pattern.findall(self.scripts)
+    def _extract_script_srcs(self):
+        """提取所有外部脚本的src"""
+        return [script.get('src') for script in self.soup.find_all('script') if script.get('src')]
 
-    def has_post_message(self):
-        """检查页面是否使用postMessage"""
-        # 直接调用检查
-        if re.search(r'postMessage\s*\(', self.scripts, re.IGNORECASE):
-            return True
+    def _extract_iframe_srcs(self):
+        """提取所有iframe的src"""
+        return [iframe.get('src') for iframe in self.soup.find_all('iframe') if iframe.get('src')]
 
-         # 事件监听器检查
-        if self.event_listeners:
-            return True
+    def _analyze_js(self):
+        """对每个脚本块做词法分析，提取postMessage调用、message监听器和onmessage赋值
 
-        return False
+        按块分析（而不是拼接后的整段脚本），一个块中未闭合的字符串或括号不会影响其他块；
+        不包含关键字的块直接跳过。返回 (postMessage调用参数列表, 监听器, onmessage赋值)。
+        """
+        if self._js is not None:
+            return self._js
+        calls, listeners, onmessage = [], [], []
+        with timer("js_lex"):
+            for index, block in enumerate(self.script_blocks):
+                skipped = not has_keywords(block)
+                record_block(block, skipped)
+                if skipped:
+                    continue
+                if self.deadline:
+                    self.deadline.check()
+                source = self._source(index)
+                calls.extend(source.post_message_calls())
+                listeners.extend(source.message_listeners())
+                onmessage.extend(source.onmessage_assignments())
+        self._js = (calls, listeners, onmessage)
+        return self._js
+
+    def _source(self, index):
+        source = self._sources.get(index)
+        if source is None:
+            source = self._sources[index] = JSSource(self.script_blocks[index], self.deadline)
+        return source
+
+    def find_functions(self, name):
+        """在所有脚本块中查找名为name的函数定义"""
+        functions = []
+        for index, block in enumerate(self.script_blocks):
+            if name in block:
+                if self.deadline:
+                    self.deadline.check()
+                functions.extend(self._source(index).functions(name))
+        return functions
+
+    def has_post_message(self):
+        """检查页面是否使用postMessage（调用、message监听器或onmessage赋值）"""
+        return any(self._analyze_js())
 
     def get_post_message_calls(self):
-        """提取所有postMessage调用"""
-        pattern = re.compile(
-            r'postMessage\s*\(\s*(.+?)\s*,\s*(.+?)\s*\)',
-            re.IGNORECASE | re.DOTALL
-        )
-        return pattern.findall(self.scripts)
+        """提取所有postMessage调用的 (data, targetOrigin)，少于两个参数的调用忽略"""
+        calls = self._analyze_js()[0]
+        return [(args[0], args[1]) for args in calls if len(args) >= 2]
 
     def get_message_event_handlers(self):
         """提取所有message事件处理函数"""
         handlers = []
-
-        # 从addEventListener提取
-        for handler in self.event_listeners:
-            # 处理匿名函数
-            if handler.strip().startswith('function') or handler.strip().startswith('('):
-                handlers.append(handler)
-            else:
-                # 处理命名函数
-                func_code = extract_js_functions(self.scripts, handler)
-                if func_code:
-                    handlers.extend(func_code)
-
-        # 处理window.onmessage
-        onmessage_pattern = re.compile(r'window\.onmessage\s*=\s*(.+?);', re.IGNORECASE | re.DOTALL)
-        onmessage_matches = onmessage_pattern.findall(self.scripts)
-        handlers.extend(onmessage_matches)
-
-        return handlers
\ No newline at end of file
+        definitions = {}  # 函数名 -> 定义（同一函数被多次注册时只查找一次）
+        _, listeners, onmessage = self._analyze_js()
+        with timer("resolve_handlers"):
+            for handler in listeners + onmessage:
+                if is_function_expression(handler):
+                    # 匿名函数/箭头函数
+                    handlers.append(handler)
+                else:
+                    # 命名函数：查找其定义
+                    name = handler_name(handler)
+                    if name:
+                        if name not in definitions:
+                            definitions[name] = self.find_functions(name)
+                        handlers.extend(definitions[name])
+        return handlers
@@ -0,0 +1,47 @@
+# 提取postMessage调用、message监听器和onmessage赋值所必需的字面量（JS区分大小写）
+KEYWORDS = ('postMessage', 'addEventListener', 'onmessage')
+
+# 本进程的累计计数（可跨进程汇总）
+_counters = {"pages": 0, "skipped_pages": 0, "html_bytes": 0, "skipped_html_bytes": 0,
+             "blocks": 0, "skipped_blocks": 0, "script_bytes": 0, "skipped_script_bytes": 0}
+
+
+def has_keywords(text):
+    """字面量查找（str的子串查找，无需正则）：文本中是否出现任一关键字"""
+    return any(keyword in text for keyword in KEYWORDS)
+
+
+def record_page(html, skipped):
+    _counters["pages"] += 1
+    _counters["html_bytes"] += len(html)
+    if skipped:
+        _counters["skipped_pages"] += 1
+        _counters["skipped_html_bytes"] += len(html)
+
+
+def record_block(block, skipped):
+    _counters["blocks"] += 1
+    _counters["script_bytes"] += len(block)
+    if skipped:
+        _counters["skipped_blocks"] += 1
+        _counters["skipped_script_bytes"] += len(block)
+
+
+def prefilter_counters():
+    return dict(_counters)
+
+
+def _size(chars):
+    return f"{chars / 1024 / 1024:.2f}MB" if chars >= 1024 * 1024 else f"{chars / 1024:.1f}KB"
+
+
+def get_prefilter_stats(counters=None):
+    """页面级和脚本块级的预过滤效果：跳过的页面/脚本块数及字符量"""
+    c = counters or prefilter_counters()
+    scanned = c["script_bytes"] - c["skipped_script_bytes"]
+    return {
+        "无关键字跳过的页面": f"{c['skipped_pages']} / {c['pages']}（{_size(c['skipped_html_bytes'])} / {_size(c['html_bytes'])}）",
+        "无关键字跳过的脚本块": f"{c['skipped_blocks']} / {c['blocks']}",
+        "词法分析的脚本量": _size(scanned),
+        "跳过的脚本量": f"{_size(c['skipped_script_bytes'])}（{c['skipped_script_bytes'] / max(c['script_bytes'], 1):.1%}）",
+    }
@@ -0,0 +1,115 @@
+import re
+import time
+
+DEFAULT_FLAGS = re.IGNORECASE | re.DOTALL
+
+
+class Rule:
+    """一条检测规则：正则在导入时编译一次，并带有字面量预过滤
+
+    literals是匹配成功时文本中必然出现的字面量（小写）。文本为ASCII时先用子串查找过滤，
+    缺少任一字面量即跳过正则；非ASCII文本的大小写折叠与str.lower()不完全一致，直接执行正则。
+
+    anchor是模式的开头部分。对"A.*B"这类模式，A之后的部分只要求"后面某处出现B"，
+    在A第一次出现的位置匹配失败时，之后的位置也必然失败；正则引擎却会在每个A处
+    都向后扫描到文本末尾（A很多时退化为平方级）。设置anchor后只在A第一次出现的位置
+    尝试匹配一次，结果与search相同，耗时为线性。
+    """
+
+    def __init__(self, name, pattern, literals=(), description='', flags=DEFAULT_FLAGS, anchor=None):
+        self.name = name
+        self.regex = re.compile(pattern, flags)
+        self.anchor = re.compile(anchor, flags) if anchor else None
+        self.literals = tuple(literal.lower() for literal in literals)
+        self.description = description
+        self.checks = 0
+        self.hits = 0
+        self.runs = 0
+        self.elapsed = 0.0
+
+    def search(self, text, lowered=None):
+        """返回匹配对象（可直接用于代码片段）；未匹配返回None"""
+        self.checks += 1
+        if lowered is None and self.literals and text.isascii():
+            lowered = text.lower()
+        if lowered is not None:
+            for literal in self.literals:
+                if literal not in lowered:
+                    return None
+        start = time.perf_counter()
+        if self.anchor is None:
+            match = self.regex.search(text)
+        else:
+            first = self.anchor.search(text)
+            match = self.regex.match(text, first.start()) if first else None
+        self.elapsed += time.perf_counter() - start
+        self.runs += 1
+        if match:
+            self.hits += 1
+        return match
+
+
+class RuleSet:
+    """一组规则：对同一段文本只做一次小写转换，按注册顺序返回所有命中的 (rule, match)"""
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def scan(self, text, deadline=None):
+        """deadline为页面分析的时间预算，每条规则执行前检查"""
+        lowered = text.lower() if text.isascii() else None
+        for rule in self.rules:
+            if deadline:
+                deadline.check()
+            match = rule.search(text, lowered)
+            if match:
+                yield rule, match
+
+
+# postMessage调用规则
+WILDCARD_TARGET_ORIGIN = Rule('wildcard_target_origin', r'["\']\*["\']', ('*',))
+DYNAMIC_TARGET_ORIGIN = Rule('dynamic_target_origin', r'location\.href|document\.referrer|window\.origin')
+UNTRUSTED_DATA_SOURCE = Rule('untrusted_data_source', r'location\.hash|document\.cookie|window\.name|localStorage')
+
+# message事件处理规则
+ORIGIN_CHECK = Rule('origin_check', r'event\.origin', ('event.origin',))
+
+# 常见的不安全origin验证模式
+WEAK_ORIGIN_RULES = RuleSet([
+    Rule('origin_indexof', r'event\.origin\.indexOf\(["\'].*?["\']\)', ('event.origin.indexOf(',),
+         anchor=r'event\.origin\.indexOf\(["\']'),  # 包含匹配
+    Rule('origin_partial_protocol', r'event\.origin\s*==?\s*["\']http', ('event.origin', 'http')),  # 不完整协议匹配
+    Rule('origin_negation_only', r'event\.origin\s*!=?\s*["\']', ('event.origin',)),  # 仅否定检查
+    Rule('origin_unchecked', r'[^!]event\.origin', ('event.origin',)),  # 无验证逻辑
+])
+
+# message数据流入的危险操作
+DANGEROUS_SINK_RULES = RuleSet([
+    Rule('sink_document_write', r'document\.write\s*\(.*event\.data.*\)', ('document.write', 'event.data'),
+         '使用document.write插入未经处理的消息数据', anchor=r'document\.write\s*\('),
+    Rule('sink_innerhtml', r'innerHTML\s*=.*event\.data', ('innerHTML', 'event.data'),
+         '使用innerHTML插入未经处理的消息数据', anchor=r'innerHTML\s*='),
+    Rule('sink_eval', r'eval\s*\(.*event\.data.*\)', ('eval', 'event.data'),
+         '使用eval执行消息数据', anchor=r'eval\s*\('),
+    Rule('sink_new_function', r'new Function\(.*event\.data.*\)', ('new Function(', 'event.data'),
+         '使用new Function执行消息数据', anchor=r'new Function\('),
+    Rule('sink_location', r'location\s*=.*event\.data', ('location', 'event.data'),
+         '将消息数据用于页面跳转', anchor=r'location\s*='),
+])
+
+ALL_RULES = [WILDCARD_TARGET_ORIGIN, DYNAMIC_TARGET_ORIGIN, UNTRUSTED_DATA_SOURCE, ORIGIN_CHECK] + \
+    WEAK_ORIGIN_RULES.rules + DANGEROUS_SINK_RULES.rules
+
+
+def rule_counters():
+    """每条规则的原始计数 {name: [检查次数, 执行次数, 命中次数, 耗时秒]}（可跨进程汇总）"""
+    return {rule.name: [rule.checks, rule.runs, rule.hits, rule.elapsed] for rule in ALL_RULES}
+
+
+def get_rule_stats(counters=None):
+    """每条规则的检查次数、预过滤后实际执行正则的次数、命中次数和正则累计耗时（按耗时从高到低）"""
+    counters = counters or rule_counters()
+    return {
+        name: f"检查 {checks} / 执行 {runs} / 命中 {hits}，{elapsed * 1000:.1f}ms"
+        for name, (checks, runs, hits, elapsed) in sorted(counters.items(), key=lambda item: -item[1][3])
+    }
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from crawler.session import HttpSession
+from crawler.gate import ContentGate, CHUNK_SIZE
+from utils import LRUCache
+from .detector import PostMessageVulnerabilityDetector
+from .parser import PageParser
+from config import SCAN_CONFIG
+
+
+class ScriptCache:
+    """外部脚本缓存：同一URL整个扫描只下载一次，同一内容（SHA-256）只分析一次
+
+    url_digests记录 URL→内容哈希（下载失败记为None，不再重试），findings记录
+    内容哈希→分析结果，两者都按LRU限制条目数，脚本内容本身分析完即丢弃。
+    配置了script_cache_file时，分析结果同时写入SQLite，下次扫描时相同内容的脚本无需重新分析。
+    """
+
+    def __init__(self, http=None, max_entries=None, cache_file=None):
+        self.http = http or HttpSession()
+        self.gate = ContentGate()
+        max_entries = max_entries or SCAN_CONFIG["script_cache_max_entries"]
+        self.url_digests = LRUCache(max_entries)
+        self.findings = LRUCache(max_entries)
+        cache_file = cache_file or SCAN_CONFIG["script_cache_file"]
+        self.conn = None
+        if cache_file:
+            self.conn = sqlite3.connect(cache_file, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS scripts (digest TEXT PRIMARY KEY, findings TEXT NOT NULL)")
+            self.conn.commit()
+        self.lock = threading.Lock()
+        self.stats = {"references": 0, "downloads": 0, "failures": 0, "url_hits": 0,
+                      "content_hits": 0, "disk_hits": 0, "analyzed": 0, "bytes": 0}
+
+    def analyze(self, script_url):
+        """返回 (外部脚本中的漏洞列表, 是否超时的部分结果)；下载失败返回空列表"""
+        with self.lock:
+            self.stats["references"] += 1
+        digest = self.url_digests.get(script_url, "")
+        if digest is None:
+            return [], False  # 之前下载失败
+        if digest:
+            findings = self.findings.get(digest)
+            if findings is not None:
+                with self.lock:
+                    self.stats["url_hits"] += 1
+                return findings, False
+            # 分析结果已被淘汰：重新下载
+
+        content = self._download(script_url)
+        if content is None:
+            self.url_digests.put(script_url, None)
+            return [], False
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self.url_digests.put(script_url, digest)
+
+        findings = self.findings.get(digest)
+        if findings is not None:
+            with self.lock:
+                self.stats["content_hits"] += 1
+            return findings, False
+        findings = self._load(digest)
+        if findings is None:
+            detector = PostMessageVulnerabilityDetector(script_url, None, parser=PageParser.from_script(content))
+            findings = detector.analyze()
+            with self.lock:
+                self.stats["analyzed"] += 1
+            if detector.partial:
+                # 超时的部分结果既不持久化也不放入内存缓存：之后引用该脚本的页面重新分析
+                return findings, True
+            self._save(digest, findings)
+        self.findings.put(digest, findings)
+        return findings, False
+
+    def _download(self, script_url):
+        """流式下载脚本（沿用爬虫的大小和类型限制），失败返回None"""
+        try:
+            with self.http.get(script_url, stream=True) as response:
+                if response.status_code != 200:
+                    content = None
+                else:
+                    reader = self.gate.open(script_url, response.headers)
+                    if reader.accepting:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            if not reader.feed(chunk):
+                                break
+                    content = reader.close()
+        except Exception:
+            content = None
+        with self.lock:
+            if content is None:
+                self.stats["failures"] += 1
+            else:
+                self.stats["downloads"] += 1
+                self.stats["bytes"] += len(content)
+        return content
+
+    def _load(self, digest):
+        if not self.conn:
+            return None
+        with self.lock:
+            row = self.conn.execute("SELECT findings FROM scripts WHERE digest = ?", (digest,)).fetchone()
+            if row:
+                self.stats["disk_hits"] += 1
+        return json.loads(row[0]) if row else None
+
+    def _save(self, digest, findings):
+        if not self.conn:
+            return
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO scripts (digest, findings) VALUES (?, ?)",
+                              (digest, json.dumps(findings, ensure_ascii=False)))
+            self.conn.commit()
+
+    def raw_stats(self):
+        """原始计数（可跨进程汇总）"""
+        return dict(self.stats)
+
+    @staticmethod
+    def format_stats(stats):
+        return {
+            "外部脚本引用数": stats["references"],
+            "外部脚本下载数": stats["downloads"],
+            "外部脚本下载失败": stats["failures"],
+            "外部脚本下载量": f"{stats['bytes'] / 1024:.1f}KB",
+            "按URL复用结果": stats["url_hits"],
+            "按内容哈希复用结果": stats["content_hits"],
+            "磁盘缓存复用结果": stats["disk_hits"],
+            "实际分析脚本数": stats["analyzed"],
+        }
+
+    def get_stats(self):
+        return self.format_stats(self.raw_stats())
+
+    def close(self):
+        self.http.close()
+        if self.conn:
+            with self.lock:
+                self.conn.close()
+                self.conn = None
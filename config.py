@@ -6,25 +6,72 @@ SCAN_CONFIG = {
     # 爬虫配置
     "max_depth": 3,  # 爬虫最大深度
     "max_threads": 5,  # 最大线程数
+    "engine": "thread",  # 爬虫引擎(thread: 多线程 / async: asyncio单事件循环)
+    "async_concurrency": 200,  # async引擎的最大并发请求数
     "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
     "timeout": 10,  # 请求超时时间(秒)
     "follow_redirects": True,  # 是否跟随重定向
     "allowed_domains": [],  # 允许爬取的额外域名(默认只爬取起始域名)
     "exclude_paths": [],  # 排除的路径(正则表达式)
+    "visited_mode": "exact",  # 已发现URL集合(exact: 64位指纹哈希表 / bloom: 布隆过滤器，适合千万级URL)
+    "bloom_capacity": 10000000,  # 布隆过滤器初始容量(超出后自动扩容)
+    "bloom_error_rate": 0.001,  # 布隆过滤器误判率上限(误判的URL会被跳过)
 
     # 动态渲染配置
     "enable_js_rendering": True,  # 启用JS动态渲染
-    "js_render_delay": 3,  # JS渲染等待时间(秒)
+    "js_render_delay": 3,  # JS渲染最长等待时间(秒)，网络空闲且DOM稳定后提前结束
+    "render_quiet_period": 0.5,  # 资源数和DOM节点数保持不变多久视为页面就绪(秒)
+    "render_pool_size": 2,  # 常驻渲染浏览器数量
+    "render_max_pages_per_browser": 50,  # 单个浏览器渲染多少页后回收重启
 
     # 网络控制配置
-    "request_delay": 1,  # 请求间隔(秒)
+    "host_rate_limit": 1.0,  # 每个主机每秒请求数(令牌桶速率，<=0表示不限速)
+    "host_burst": 3,  # 每个主机允许的突发请求数(令牌桶容量)
+    "rate_limit_backoff": 30,  # 收到429但无Retry-After时，对该主机的退避时间(秒)
+    "max_rate_limit_retries": 3,  # 同一URL因限速重新入队的最大次数
+
+    # 流水线配置
+    "pipeline_queue_size": 100,  # 爬取→分析之间的有界队列长度(决定内存中最多缓存多少个页面)
+
+    # 断点续爬配置（--resume）
+    "checkpoint_batch": 200,  # 累积多少条状态变更后提交一次检查点
+    "checkpoint_interval": 5,  # 距上次提交超过多少秒也会提交检查点
     "use_proxy": False,  # 是否使用代理
     "proxies": {"http": "http://127.0.0.1:8080", "https": "http://127.0.0.1:8080"},
     "ignore_ssl_errors": False,  # 忽略SSL证书错误
+    "pool_max_hosts": 50,  # 连接池缓存的主机数
+    "pool_maxsize_per_host": 10,  # 每个主机的最大keep-alive连接数
+    "http_cache_dir": None,  # 磁盘HTTP缓存目录(None为不启用)，重复扫描时发送条件请求
+    "http_cache_max_mb": 512,  # HTTP缓存容量上限(MB)，超出后按LRU淘汰
+    "max_body_mb": 5,  # 单个响应正文上限(MB)，超出即中止下载
+    # 允许下载正文的Content-Type前缀(其余类型只读响应头即中止；缺少Content-Type时按前几个字节嗅探)
+    "allowed_content_types": ["text/", "application/xhtml+xml", "application/xml", "application/javascript",
+                              "application/x-javascript", "application/ecmascript", "application/json"],
+
+    # 页面分析配置
+    "parser_backend": "stream",  # HTML解析后端(stream: 单遍扫描不建DOM树 / bs4: BeautifulSoup完整解析)，提取结果相同
+    "analyze_external_scripts": True,  # 下载并分析<script src>引用的外部脚本
+    "script_cache_max_entries": 5000,  # 外部脚本缓存条目上限(URL→内容哈希、内容哈希→分析结果各自独立计数)
+    "script_cache_file": None,  # 脚本分析结果的持久化文件(SQLite，None为只在内存中缓存)，跨扫描复用
+    "findings_cache_max_entries": 10000,  # 检测结果缓存条目上限(页面级、处理函数级各自计数，LRU淘汰)
+    "analysis_workers": 1,  # 分析进程数(>1时使用进程池多核分析)
+    "analysis_chunk_kb": 256,  # 多进程分析时每次提交给进程池的HTML总量上限(KB)
+    "page_analysis_budget": 10,  # 单个页面的分析时间预算(秒，0为不限制)，超时的页面标记为部分结果
+    "slowest_report_size": 10,  # 扫描结束时列出的最慢页面数
+    "metrics_file": None,  # 分析阶段计时等指标的JSON输出文件(None为不启用计时)
 
     # 漏洞验证配置
     "headless_mode": True,  # 浏览器无头模式
     "exploit_timeout": 5,  # 漏洞验证超时(秒)
+    "exploit_max_validations_per_browser": 100,  # 单个验证浏览器验证多少个漏洞后回收重启
+    "exploit_mode": "batch",  # 验证方式(batch: 目标页只加载一次，依次发送全部Payload / per_payload: 每个Payload单独加载POC)
+    "exploit_batch_interval_ms": 50,  # batch模式下相邻两个Payload的发送间隔(毫秒)
+    "exploit_batch_settle": 1.5,  # batch模式下全部Payload发送后等待执行结果的时间(秒)
+    "poc_server_port": 0,  # 提供POC页面的本地HTTP服务器端口(只监听127.0.0.1，0为随机空闲端口)
+    "validate_workers": 1,  # 并行验证的浏览器数(验证任务按严重程度从高到低调度)
+    "validate_job_timeout": 120,  # 单个漏洞验证任务的时间限制(秒，0为不限制)，超时的任务下次重新验证
+    "validate_dedup": True,  # 按(处理函数指纹, 漏洞类型)分组验证，代表页面的结论沿用到组内其余页面
+    "validate_group_representatives": 1,  # 每组最多验证几个代表页面(均未确认可利用时才验证下一个)
 }
 
 # 报告配置
@@ -119,6 +166,36 @@ frame.onload = () => {{
 </script>
 </body>
 </html>
+""",
+    # batch模式：目标页只在iframe中加载一次，收到就绪消息后依次发送全部带编号的Payload；
+    # 被测页面中的alert/confirm/prompt/print和DOM变化由注入脚本上报（见validator.exploit.HOOK_JS）
+    "batch": """
+<!DOCTYPE html>
+<html>
+<body>
+<iframe id="targetFrame" src="{target_url}" width="800" height="600"></iframe>
+<script>
+window.__pmxss = {{state: 'loading', hits: []}};
+const frame = document.getElementById('targetFrame');
+const payloads = {payloads_json};
+function sendAll() {{
+    __pmxss.state = 'sending';
+    payloads.forEach((payload, i) => setTimeout(() => {{
+        frame.contentWindow.postMessage(payload, '*');
+        if (i === payloads.length - 1) __pmxss.state = 'sent';
+    }}, i * {interval_ms}));
+}}
+window.addEventListener('message', (event) => {{
+    const data = event.data;
+    if (!data || typeof data !== 'object' || !data.__pmxss) return;
+    if (data.__pmxss === 'ready' && event.source === frame.contentWindow && __pmxss.state === 'loading') sendAll();
+    else if (data.__pmxss === 'hit') __pmxss.hits.push([data.how, data.value]);
+}});
+// iframe加载完成仍未收到就绪消息：目标页禁止被嵌入(X-Frame-Options/CSP)或加载失败
+frame.onload = () => setTimeout(() => {{ if (__pmxss.state === 'loading') __pmxss.state = 'blocked'; }}, 300);
+</script>
+</body>
+</html>
 """
 }
 
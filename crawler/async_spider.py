@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import asyncio
+import time
+import aiohttp  # 需安装aiohttp
+from .spider import Spider
+from .scheduler import RateLimited
+from .gate import CHUNK_SIZE
+from config import SCAN_CONFIG
+
+
+class AsyncSpider(Spider):
+    """基于asyncio的爬虫：单事件循环 + 有界信号量并发抓取
+
+    与Spider保持相同的 crawl() -> {url: html} 约定，
+    链接过滤(is_valid_url)和深度(max_depth)语义完全一致。
+    """
+
+    def __init__(self, start_url, concurrency=None, state_file=None, page_sink=None):
+        super().__init__(start_url, state_file=state_file, page_sink=page_sink)
+        self.concurrency = concurrency or SCAN_CONFIG["async_concurrency"]
+        self.conn_stats = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+        self.links_added = None  # 任务发现新链接时唤醒调度循环（asyncio.Event，在事件循环中创建）
+
+    def crawl(self):
+        """开始爬取（阻塞直到所有页面处理完成）"""
+        print(f"启动异步爬虫，并发数: {self.concurrency}")  # 调试日志
+        start_time = time.time()
+        try:
+            asyncio.run(self._crawl())
+        finally:
+            # 包括Ctrl-C在内，退出前都写入最后一个检查点
+            elapsed = time.time() - start_time
+            rate = self.page_count / elapsed if elapsed > 0 else 0
+            print(f"异步爬取完成，总爬取页面数: {self.page_count}，耗时 {elapsed:.2f}s ({rate:.1f} 页/秒)")  # 调试日志
+            self._report_stats()
+            self.close()
+        return self.pages
+
+    def _connection_stats(self):
+        """连接复用统计（数据来自aiohttp的trace回调）"""
+        requests_sent = self.conn_stats["requests"]
+        reused = self.conn_stats["reused_connections"]
+        return {
+            "HTTP请求数": requests_sent,
+            "新建连接数": self.conn_stats["new_connections"],
+            "复用连接请求数": reused,
+            "连接复用率": f"{reused / requests_sent:.1%}" if requests_sent else "0.0%",
+        }
+
+    async def _crawl(self):
+        # 复用父类的HostScheduler作为待爬队列（起始URL已在其中）
+        frontier = self.queue
+        semaphore = asyncio.BoundedSemaphore(self.concurrency)
+        running = set()
+        self.links_added = asyncio.Event()
+        async with self._create_session() as session:
+            while True:
+                self.links_added.clear()
+                item, wait = frontier.poll()
+                while item is not None:
+                    url, depth = item
+                    if depth <= SCAN_CONFIG["max_depth"]:
+                        # 并发已满时在此等待，直到有任务释放信号量
+                        await semaphore.acquire()
+                        running.add(asyncio.ensure_future(self._process(session, semaphore, url, depth)))
+                    else:
+                        self._complete(url)
+                    frontier.task_done()
+                    item, wait = frontier.poll()
+
+                if not running:
+                    if wait is None:
+                        break  # 队列为空且没有进行中的任务
+                    await asyncio.sleep(wait)  # 所有主机都在限速/退避中
+                    continue
+                # 等待任务完成、有新链接入队，或某个主机的令牌到期
+                # 新链接由任务自行入队（任务可能还在等待下游队列，不能只等任务完成）
+                woken = asyncio.ensure_future(self.links_added.wait())
+                _, running = await asyncio.wait(running | {woken}, timeout=wait,
+                                                return_when=asyncio.FIRST_COMPLETED)
+                woken.cancel()
+                running.discard(woken)
+
+    def _create_session(self):
+        """创建共享的aiohttp会话（按主机限制连接数，应用SSL配置）"""
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=SCAN_CONFIG["pool_maxsize_per_host"],
+            ssl=False if SCAN_CONFIG["ignore_ssl_errors"] else None
+        )
+        timeout = aiohttp.ClientTimeout(total=SCAN_CONFIG["timeout"])
+        headers = {"User-Agent": SCAN_CONFIG["user_agent"]}
+        return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers,
+                                     trace_configs=[self._create_trace_config()])
+
+    def _create_trace_config(self):
+        """通过trace回调统计新建连接与复用连接"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.conn_stats["requests"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.conn_stats["new_connections"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.conn_stats["reused_connections"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def _proxy_for(self, url):
+        """aiohttp按请求传入代理"""
+        if not SCAN_CONFIG["use_proxy"]:
+            return None
+        scheme = url.split(":", 1)[0].lower()
+        return SCAN_CONFIG["proxies"].get(scheme)
+
+    async def _process(self, session, semaphore, url, depth):
+        """处理单个URL，新发现的链接直接加入队列"""
+        content, content_type, requeued = None, None, False
+        try:
+            content, content_type = await self._fetch_page_async(session, url)
+            if content and depth < SCAN_CONFIG["max_depth"]:
+                for link in self._collect_new_links(content, url):
+                    self._enqueue(link, depth + 1)
+                self.links_added.set()
+        except RateLimited as e:
+            print(str(e))  # 调试日志
+            requeued = self._requeue_rate_limited(url, depth, e.retry_after)
+        except asyncio.CancelledError:
+            requeued = True  # 被中断（如Ctrl-C）的URL保持待爬状态，续爬时重新抓取
+            raise
+        except Exception as e:
+            print(f"异步爬取错误 {url}: {str(e)}")
+        finally:
+            try:
+                if not requeued:
+                    await self._complete_async(url, content, content_type)
+            finally:
+                semaphore.release()
+
+    async def _complete_async(self, url, content, content_type):
+        """_complete的异步版本：下游队列已满时在线程池中阻塞等待（背压只占用本任务的并发名额），
+        不阻塞事件循环上的其他请求"""
+        if self._mark_done(url, content, content_type):
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._emit_page, url, content)
+
+    async def _fetch_page_async(self, session, url, conditional=True):
+        """获取页面内容（静态请求失败时回退到线程池中的动态渲染）"""
+        try:
+            headers = self.http_cache.conditional_headers(url) if self.http_cache and conditional else {}
+            async with session.get(url, headers=headers, allow_redirects=SCAN_CONFIG["follow_redirects"],
+                                   proxy=self._proxy_for(url)) as response:
+                # aiohttp的响应头大小写不敏感，与requests一致
+                self._check_rate_limit(url, response.status, response.headers)
+                if response.status == 304:
+                    cached = self._handle_cache(url, 304, "", response.headers, conditional)
+                    if cached is not None:
+                        return cached
+                else:
+                    reader = self.gate.open(url, response.headers)
+                    if reader.accepting:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            if not reader.feed(chunk):
+                                break
+                    content = reader.close()
+                    if content is None:
+                        return None, reader.content_type
+                    return self._handle_cache(url, response.status, content, response.headers)
+            # 缓存内容已丢失：不带条件请求头重新获取完整页面（不能把304当作空页面）
+            return await self._fetch_page_async(session, url, conditional=False)
+        except RateLimited:
+            raise
+        except Exception as e:
+            print(f"静态请求失败 {url}: {str(e)}，尝试动态渲染...")  # 调试日志
+            if SCAN_CONFIG["enable_js_rendering"]:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(None, self._render_page, url)
+        return None, None
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import sqlite3
+import threading
+import time
+import zlib
+from config import SCAN_CONFIG
+
+PENDING = 0
+DONE = 1
+
+
+class CrawlState:
+    """基于SQLite的持久化爬取状态（待爬队列、已发现URL、已爬页面）
+
+    写操作先缓存在内存中，每积累checkpoint_batch条或间隔checkpoint_interval秒
+    在一个事务中批量提交（WAL模式）。进程崩溃或Ctrl-C后，最多丢失最后一个检查点之后的进度，
+    重启时未完成的URL会被重新抓取，已完成的URL不会。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                depth INTEGER NOT NULL,
+                status INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_type TEXT,
+                body BLOB
+            );
+        """)
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.discovered = []  # 待写入的 (url, depth)
+        self.done = []  # 待写入的已完成URL
+        self.page_rows = []  # 待写入的页面 (url, content_type, body)
+        self.last_flush = time.time()
+        self.closed = False
+        self.stats = {"checkpoints": 0, "urls": 0, "flush_time": 0.0}
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM urls LIMIT 1").fetchone() is None
+
+    def load(self):
+        """读取上次的状态，返回 (待爬[(url, depth)], 已发现URL列表)"""
+        pending = self.conn.execute(
+            "SELECT url, depth FROM urls WHERE status = ?", (PENDING,)
+        ).fetchall()
+        seen = [row[0] for row in self.conn.execute("SELECT url FROM urls")]
+        return pending, seen
+
+    def iter_pages(self):
+        """逐个读取已爬页面 (url, html)，避免一次性载入内存"""
+        for url, body in self.conn.execute("SELECT url, body FROM pages"):
+            yield url, zlib.decompress(body).decode("utf-8")
+
+    def add_url(self, url, depth):
+        """记录新发现的URL（待爬）"""
+        with self.lock:
+            if self.closed:
+                return
+            self.discovered.append((url, depth))
+            self._maybe_flush()
+
+    def mark_done(self, url, content=None, content_type=None):
+        """记录URL已处理完成，可同时保存页面内容"""
+        with self.lock:
+            if self.closed:
+                return  # 中断退出后仍在运行的线程，其结果不再写入
+            if content is not None:
+                body = zlib.compress(content.encode("utf-8"))
+                self.page_rows.append((url, content_type, body))
+            self.done.append(url)
+            self._maybe_flush()
+
+    def _maybe_flush(self):
+        pending_ops = len(self.discovered) + len(self.done)
+        if (pending_ops >= SCAN_CONFIG["checkpoint_batch"] or
+                time.time() - self.last_flush >= SCAN_CONFIG["checkpoint_interval"]):
+            self._flush()
+
+    def _flush(self):
+        """在一个事务中提交缓存的写操作（调用方需持有锁）"""
+        if not (self.discovered or self.done or self.page_rows):
+            return
+        start = time.perf_counter()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, depth, status) VALUES (?, ?, ?)",
+                ((url, depth, PENDING) for url, depth in self.discovered)
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages (url, content_type, body) VALUES (?, ?, ?)",
+                self.page_rows
+            )
+            self.conn.executemany(
+                "UPDATE urls SET status = ? WHERE url = ?",
+                ((DONE, url) for url in self.done)
+            )
+        self.stats["flush_time"] += time.perf_counter() - start
+        self.stats["checkpoints"] += 1
+        self.stats["urls"] += len(self.done)
+        self.discovered = []
+        self.done = []
+        self.page_rows = []
+        self.last_flush = time.time()
+
+    def flush(self):
+        with self.lock:
+            if not self.closed:
+                self._flush()
+
+    def get_stats(self):
+        urls = self.stats["urls"]
+        per_thousand_ms = self.stats["flush_time"] * 1000 / urls * 1000 if urls else 0
+        return {
+            "检查点次数": self.stats["checkpoints"],
+            "检查点总耗时": f"{self.stats['flush_time'] * 1000:.1f}ms",
+            "每1000个URL检查点耗时": f"{per_thousand_ms:.1f}ms",
+        }
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self._flush()
+            self.closed = True
+            self.conn.close()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import codecs
+import re
+import threading
+from config import SCAN_CONFIG
+
+# 常见二进制文件头（Content-Type缺失或不可信时用于嗅探）
+BINARY_SIGNATURES = (
+    b"%PDF", b"PK\x03\x04", b"\x89PNG", b"GIF8", b"\xff\xd8\xff", b"ID3",
+    b"\x1f\x8b", b"OggS", b"RIFF", b"\x1a\x45\xdf\xa3", b"\x00\x00\x00",
+)
+CHARSET_PATTERN = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+# 字节顺序标记 -> 编码（UTF-32LE的BOM以UTF-16LE的BOM开头，需先判断）
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"), (codecs.BOM_UTF8, "utf-8-sig"),
+)
+# 文本中本身就含大量NUL字节的宽字符编码
+WIDE_CHARSETS = ("utf16", "utf32", "ucs2", "ucs4")
+CHUNK_SIZE = 64 * 1024  # 流式读取的块大小
+
+
+class ContentGate:
+    """流式下载的准入判断：根据响应头或前几个字节决定是否继续下载
+
+    非文本类型、超过大小上限、嗅探为二进制的响应会在读取正文前（或读取过程中）中止，
+    统计因此避免下载的字节数。
+    """
+
+    def __init__(self):
+        self.max_bytes = int(SCAN_CONFIG["max_body_mb"] * 1024 * 1024)
+        self.allowed_types = tuple(SCAN_CONFIG["allowed_content_types"])
+        self.lock = threading.Lock()
+        self.stats = {"aborted": 0, "bytes_read": 0, "bytes_avoided": 0}
+
+    def open(self, url, headers):
+        """为一个响应创建正文读取器（响应头检查在创建时完成）"""
+        return BodyReader(self, url, headers)
+
+    def check_headers(self, content_type, content_length):
+        """根据响应头判断，返回中止原因；可以继续下载时返回None"""
+        mime = (content_type or "").split(";")[0].strip().lower()
+        if mime and not mime.startswith(self.allowed_types):
+            return f"非文本类型 {mime}"
+        if content_length is not None and content_length > self.max_bytes:
+            return f"响应过大 {content_length} 字节"
+        return None
+
+    def sniff(self, first_chunk, content_type=""):
+        """嗅探首个数据块，返回中止原因；文本内容返回None
+
+        UTF-16/32文本（有BOM或声明了对应charset）中本身就有NUL字节，不做NUL字节判断，
+        也不匹配以NUL开头的文件头。
+        """
+        head = first_chunk[:16]
+        if self.is_wide_text(head, content_type):
+            signatures = tuple(sig for sig in BINARY_SIGNATURES if not sig.startswith(b"\x00"))
+            return "内容嗅探为二进制" if head.startswith(signatures) else None
+        if head.startswith(BINARY_SIGNATURES) or b"\x00" in first_chunk[:1024]:
+            return "内容嗅探为二进制"
+        return None
+
+    def record(self, bytes_read, content_length=None, aborted=False):
+        """记录一次下载；中止时按Content-Length计算避免下载的字节数"""
+        with self.lock:
+            self.stats["bytes_read"] += bytes_read
+            if aborted:
+                self.stats["aborted"] += 1
+                if content_length is not None:
+                    self.stats["bytes_avoided"] += max(content_length - bytes_read, 0)
+
+    @staticmethod
+    def parse_length(headers):
+        try:
+            return int(headers.get("content-length"))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def bom_encoding(data):
+        """按开头的BOM判断编码，没有BOM时返回None"""
+        for bom, encoding in BOM_ENCODINGS:
+            if data.startswith(bom):
+                return encoding
+        return None
+
+    @staticmethod
+    def declared_charset(content_type):
+        """Content-Type中声明的charset（小写），没有声明时返回空字符串"""
+        match = CHARSET_PATTERN.search(content_type or "")
+        return match.group(1).lower() if match else ""
+
+    @classmethod
+    def is_wide_text(cls, head, content_type):
+        """是否为UTF-16/32文本：有对应的BOM，或Content-Type声明了对应charset"""
+        if cls.bom_encoding(head) in ("utf-16", "utf-32"):
+            return True
+        charset = cls.declared_charset(content_type).replace("-", "").replace("_", "")
+        return charset.startswith(WIDE_CHARSETS)
+
+    @classmethod
+    def decode(cls, body, content_type):
+        """按BOM或Content-Type中的charset解码（BOM优先），缺省为UTF-8"""
+        encoding = cls.bom_encoding(body[:4]) or cls.declared_charset(content_type) or "utf-8"
+        try:
+            return body.decode(encoding, errors="replace")
+        except LookupError:
+            return body.decode("utf-8", errors="replace")
+
+    def get_stats(self):
+        return {
+            "中止下载数": self.stats["aborted"],
+            "已下载正文": f"{self.stats['bytes_read'] / 1024:.1f}KB",
+            "避免下载": f"{self.stats['bytes_avoided'] / 1024:.1f}KB",
+        }
+
+
+class BodyReader:
+    """逐块接收响应正文；不应继续下载时feed返回False，调用方停止读取并关闭响应
+
+    用法（同步与异步引擎相同）：
+        reader = gate.open(url, headers)
+        if reader.accepting:
+            for chunk in chunks:
+                if not reader.feed(chunk):
+                    break
+        content = reader.close()
+    """
+
+    def __init__(self, gate, url, headers):
+        self.gate = gate
+        self.url = url
+        self.content_type = headers.get("content-type", "")
+        self.length = gate.parse_length(headers)
+        self.chunks = []
+        self.size = 0
+        self.reason = gate.check_headers(self.content_type, self.length)
+
+    @property
+    def accepting(self):
+        return self.reason is None
+
+    def feed(self, chunk):
+        if not chunk:
+            return True
+        if not self.chunks:
+            self.reason = self.gate.sniff(chunk, self.content_type)
+        self.size += len(chunk)
+        if self.reason is None and self.size > self.gate.max_bytes:
+            self.reason = f"响应超过{self.gate.max_bytes}字节上限"
+        if self.reason:
+            return False
+        self.chunks.append(chunk)
+        return True
+
+    def close(self):
+        """结束读取，返回解码后的文本；下载被中止时返回None"""
+        aborted = self.reason is not None
+        self.gate.record(self.size, self.length, aborted)
+        if aborted:
+            print(f"跳过下载 {self.url}: {self.reason}")  # 调试日志
+            return None
+        return self.gate.decode(b"".join(self.chunks), self.content_type)
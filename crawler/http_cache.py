@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config import SCAN_CONFIG
+
+
+class HttpCache:
+    """本地磁盘HTTP响应缓存（按内容寻址），用于重复扫描时的条件请求
+
+    页面内容按SHA-256存放在 objects/ 下（相同内容只存一份），索引库记录每个URL的
+    ETag/Last-Modified/content-type。再次抓取时发送If-None-Match/If-Modified-Since，
+    服务器返回304则直接读取本地内容。总大小超过上限时按最近最少使用淘汰。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or SCAN_CONFIG["http_cache_dir"]
+        self.max_bytes = max_bytes or SCAN_CONFIG["http_cache_max_mb"] * 1024 * 1024
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.cache_dir, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON entries (last_used)")
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.total_bytes = self._total_bytes()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "bytes_saved": 0, "evictions": 0}
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _lookup(self, url):
+        return self.conn.execute(
+            "SELECT digest, size, etag, last_modified, content_type FROM entries WHERE url = ?", (url,)
+        ).fetchone()
+
+    def conditional_headers(self, url):
+        """返回条件请求头（无缓存时为空）"""
+        with self.lock:
+            row = self._lookup(url)
+        headers = {}
+        if row:
+            _, _, etag, last_modified, _ = row
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def load(self, url):
+        """服务器返回304时读取本地内容，返回(content, content_type)；缓存缺失返回None"""
+        with self.lock:
+            row = self._lookup(url)
+            if not row:
+                self.stats["misses"] += 1
+                return None
+            digest, size, _, _, content_type = row
+            try:
+                with open(self._object_path(digest), "rb") as f:
+                    content = f.read().decode("utf-8")
+            except OSError:
+                # 对象文件丢失：删除索引，按未命中处理
+                self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self.total_bytes -= self._release_object(digest, size)
+                self.conn.commit()
+                self.stats["misses"] += 1
+                return None
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += size
+            return content, content_type
+
+    def store(self, url, content, headers):
+        """保存200响应；没有ETag/Last-Modified或声明no-store的响应无法重新验证，不缓存"""
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if "no-store" in headers.get("cache-control", "").lower() or not (etag or last_modified):
+            with self.lock:
+                self.stats["misses"] += 1
+            return
+
+        body = content.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        with self.lock:
+            self.stats["misses"] += 1
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+                self.total_bytes += len(body)
+            old = self._lookup(url)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (url, digest, size, etag, last_modified, content_type, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, len(body), etag, last_modified, headers.get("content-type", ""), time.time())
+            )
+            if old and old[0] != digest:
+                self.total_bytes -= self._release_object(old[0], old[1])
+            self.conn.commit()
+            self.stats["stores"] += 1
+            self._evict()
+
+    def _release_object(self, digest, size):
+        """没有URL再引用的对象文件才删除，返回释放的字节数（调用方需持有锁）"""
+        in_use = self.conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+        if in_use:
+            return 0
+        try:
+            os.remove(self._object_path(digest))
+        except OSError:
+            pass
+        return size
+
+    def _total_bytes(self):
+        """按不重复的对象统计占用空间"""
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM (SELECT digest, MAX(size) AS size FROM entries GROUP BY digest)"
+        ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        """超过容量上限时按LRU淘汰，直到降到上限的90%（调用方需持有锁）"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT url, digest, size FROM entries ORDER BY last_used").fetchall()
+        for url, digest, size in rows:
+            if self.total_bytes <= target:
+                break
+            self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self.total_bytes -= self._release_object(digest, size)
+            self.stats["evictions"] += 1
+        self.conn.commit()
+
+    def get_stats(self):
+        return {
+            "HTTP缓存命中(304)": self.stats["hits"],
+            "HTTP缓存未命中": self.stats["misses"],
+            "HTTP缓存写入": self.stats["stores"],
+            "HTTP缓存淘汰": self.stats["evictions"],
+            "节省下载量": f"{self.stats['bytes_saved'] / 1024:.1f}KB",
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import threading
+import time
+from queue import Queue, Empty
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+from config import SCAN_CONFIG
+
+# 就绪检测脚本：文档加载完成 + 已完成的资源请求数 + DOM节点数
+READY_STATE_JS = """
+return [document.readyState,
+        performance.getEntriesByType('resource').length,
+        document.getElementsByTagName('*').length];
+"""
+
+
+class RenderWorker:
+    """长期存活的渲染工作者：复用同一个浏览器，每个页面使用新标签页"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.driver = None
+        self.base_handle = None
+        self.pages_rendered = 0
+
+    def start(self):
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-sandbox")  # 增加兼容性
+        chrome_options.add_argument("--disable-dev-shm-usage")  # 解决内存问题
+
+        service = Service(ChromeDriverManager().install())
+        self.driver = webdriver.Chrome(service=service, options=chrome_options)
+        self.driver.set_page_load_timeout(SCAN_CONFIG["timeout"])
+        self.base_handle = self.driver.current_window_handle
+        self.pages_rendered = 0
+
+    def render(self, url):
+        """在新标签页中渲染页面，返回页面源码"""
+        self.driver.switch_to.new_window('tab')
+        try:
+            self.driver.get(url)
+            self._wait_until_ready()
+            return self.driver.page_source
+        finally:
+            # 关闭标签页，回到空白的基础窗口，避免页面状态累积
+            self.driver.close()
+            self.driver.switch_to.window(self.base_handle)
+            self.pages_rendered += 1
+
+    def _wait_until_ready(self):
+        """等待页面就绪：网络空闲且DOM稳定一段时间，最长等待js_render_delay秒"""
+        deadline = time.time() + SCAN_CONFIG["js_render_delay"]
+        quiet_period = SCAN_CONFIG["render_quiet_period"]
+        last_snapshot = None
+        stable_since = time.time()
+        while time.time() < deadline:
+            ready_state, resources, nodes = self.driver.execute_script(READY_STATE_JS)
+            snapshot = (resources, nodes)
+            if snapshot != last_snapshot:
+                last_snapshot = snapshot
+                stable_since = time.time()
+            elif ready_state == "complete" and time.time() - stable_since >= quiet_period:
+                return
+            time.sleep(0.1)
+
+    def quit(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+
+class RenderPool:
+    """有界的无头浏览器渲染池（按需启动，达到页数上限后回收重启浏览器）"""
+
+    def __init__(self, size=None, max_pages_per_browser=None):
+        self.size = size or SCAN_CONFIG["render_pool_size"]
+        self.max_pages_per_browser = max_pages_per_browser or SCAN_CONFIG["render_max_pages_per_browser"]
+        self.idle = Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+        self.stats = {"rendered": 0, "failed": 0, "launches": 0, "recycles": 0,
+                      "wait_total": 0.0, "wait_max": 0.0}
+
+    def render(self, url):
+        """借用一个工作者渲染页面，返回(content, content_type)"""
+        wait_start = time.time()
+        worker = self._acquire()
+        waited = time.time() - wait_start
+        with self.lock:
+            self.stats["wait_total"] += waited
+            self.stats["wait_max"] = max(self.stats["wait_max"], waited)
+
+        try:
+            if not worker.driver:
+                worker.start()
+                with self.lock:
+                    self.stats["launches"] += 1
+            content = worker.render(url)
+            with self.lock:
+                self.stats["rendered"] += 1
+            return content, "text/html"
+        except Exception:
+            # 浏览器异常时直接丢弃，下次借用时重新启动
+            worker.quit()
+            with self.lock:
+                self.stats["failed"] += 1
+            raise
+        finally:
+            if worker.driver and worker.pages_rendered >= self.max_pages_per_browser:
+                worker.quit()
+                with self.lock:
+                    self.stats["recycles"] += 1
+            self.idle.put(worker)
+
+    def _acquire(self):
+        """优先复用空闲工作者，未达上限时新建，否则排队等待"""
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+        with self.lock:
+            if len(self.workers) < self.size:
+                worker = RenderWorker(len(self.workers) + 1)
+                self.workers.append(worker)
+                return worker
+        return self.idle.get()
+
+    def get_stats(self):
+        requests = self.stats["rendered"] + self.stats["failed"]
+        avg_wait = self.stats["wait_total"] / requests if requests else 0
+        return {
+            "渲染池大小": f"{len(self.workers)}/{self.size}",
+            "动态渲染页数": self.stats["rendered"],
+            "动态渲染失败数": self.stats["failed"],
+            "浏览器启动次数": self.stats["launches"],
+            "浏览器回收次数": self.stats["recycles"],
+            "平均排队等待": f"{avg_wait:.2f}s",
+            "最长排队等待": f"{self.stats['wait_max']:.2f}s",
+        }
+
+    def close(self):
+        for worker in self.workers:
+            worker.quit()
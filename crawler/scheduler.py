@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import threading
+import time
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from queue import Empty
+from utils import get_domain
+from config import SCAN_CONFIG
+
+
+class RateLimited(Exception):
+    """目标主机返回429/503(Retry-After)，需要对该主机退避"""
+
+    def __init__(self, url, retry_after):
+        super().__init__(f"主机限速，{retry_after:.1f}秒后重试: {url}")
+        self.url = url
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value, default=None):
+    """解析Retry-After头（秒数或HTTP日期），返回需要等待的秒数"""
+    default = SCAN_CONFIG["rate_limit_backoff"] if default is None else default
+    if not value:
+        return default
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """令牌桶：平均每秒rate个请求，最多允许burst个突发请求"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # 429退避截止时间
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        else:
+            self.tokens = self.burst  # rate<=0 表示不限速
+        self.updated = now
+
+    def ready_at(self, now):
+        """返回下一个令牌可用的时间点"""
+        self._refill(now)
+        ready = now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+        return max(ready, self.blocked_until)
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class HostScheduler:
+    """按主机限速的爬取队列，接口与queue.Queue兼容(put/get/task_done/join)
+
+    每个主机一个令牌桶和一个待爬队列；get()只返回当前有令牌的主机的URL，
+    某个主机被限速或退避时，其他主机的URL仍可被立即取出。
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.rate = SCAN_CONFIG["host_rate_limit"] if rate is None else rate
+        self.burst = burst or SCAN_CONFIG["host_burst"]
+        self.cond = threading.Condition()
+        self.host_queues = OrderedDict()  # host -> deque[(url, depth)]，按轮询顺序排列
+        self.buckets = {}
+        self.pending = 0
+        self.unfinished = 0
+        self.stats = {"throttled": 0, "backoff_seconds": 0.0}
+
+    def _bucket(self, host):
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+    def put(self, item):
+        url, _ = item
+        host = get_domain(url)
+        with self.cond:
+            self.host_queues.setdefault(host, deque()).append(item)
+            self.pending += 1
+            self.unfinished += 1
+            self.cond.notify_all()  # join()与get()共用条件变量，需唤醒全部等待者
+
+    def poll(self):
+        """非阻塞获取：返回(item, 0)，或(None, 距离下个可用URL的秒数)，队列为空时返回(None, None)"""
+        with self.cond:
+            return self._poll_locked()
+
+    def _poll_locked(self):
+        now = time.monotonic()
+        earliest = None
+        for host, host_queue in self.host_queues.items():
+            bucket = self._bucket(host)
+            ready = bucket.ready_at(now)
+            if ready <= now:
+                bucket.consume(now)
+                item = host_queue.popleft()
+                self.pending -= 1
+                # 轮询：被服务的主机移到末尾；队列为空则移除
+                if host_queue:
+                    self.host_queues.move_to_end(host)
+                else:
+                    del self.host_queues[host]
+                return item, 0
+            earliest = ready if earliest is None else min(earliest, ready)
+        return None, (None if earliest is None else earliest - now)
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                item, wait = self._poll_locked()
+                if item is not None:
+                    return item
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.cond.wait(wait)
+
+    def get_nowait(self):
+        item, _ = self.poll()
+        if item is None:
+            raise Empty
+        return item
+
+    def backoff(self, host, seconds):
+        """仅对指定主机退避（429/Retry-After），不影响其他主机"""
+        with self.cond:
+            bucket = self._bucket(host)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + seconds)
+            self.stats["throttled"] += 1
+            self.stats["backoff_seconds"] += seconds
+
+    def task_done(self):
+        with self.cond:
+            self.unfinished -= 1
+            if self.unfinished <= 0:
+                self.cond.notify_all()
+
+    def join(self):
+        with self.cond:
+            while self.unfinished > 0:
+                self.cond.wait()
+
+    def qsize(self):
+        return self.pending
+
+    def empty(self):
+        return self.pending == 0
+
+    def get_stats(self):
+        return {
+            "主机数": len(self.buckets),
+            "限速响应次数": self.stats["throttled"],
+            "累计退避时间": f"{self.stats['backoff_seconds']:.1f}s",
+        }
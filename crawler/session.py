@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import threading
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import make_headers
+from config import SCAN_CONFIG
+
+
+def _counting_pool_classes(session):
+    """返回按协议划分的连接池类：其连接每次建立TCP连接、发送请求时计入session的统计
+
+    在connect()中计数，urllib3静默重连（keep-alive连接已被服务器关闭）也能统计到。
+    """
+    class CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            super().connect()
+            session.count("connections")
+
+        def request(self, *args, **kwargs):
+            session.count("requests")
+            super().request(*args, **kwargs)
+
+    class CountingHTTPSConnection(CountingHTTPConnection, HTTPSConnection):
+        pass
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountingHTTPConnection
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+    return {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+
+class _CountingAdapter(HTTPAdapter):
+    """直连和HTTP(S)代理都使用计数的连接池类（SOCKS代理保留其自身的连接类，不计数）"""
+
+    def __init__(self, pool_classes, **kwargs):
+        self.pool_classes = pool_classes  # HTTPAdapter.__init__中会调用init_poolmanager
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+        if not proxy.lower().startswith("socks"):
+            manager.pool_classes_by_scheme = self.pool_classes
+        return manager
+
+
+class HttpSession:
+    """线程安全的共享HTTP会话
+
+    所有爬虫线程共用一个连接池：按主机复用keep-alive连接（省去重复的TCP/TLS握手），
+    自动协商gzip/deflate/br压缩，并应用配置中的代理和SSL设置。
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        # pool_block=True：同一主机的并发连接数不超过pool_maxsize_per_host
+        self.adapter = _CountingAdapter(
+            _counting_pool_classes(self),
+            pool_connections=SCAN_CONFIG["pool_max_hosts"],
+            pool_maxsize=SCAN_CONFIG["pool_maxsize_per_host"],
+            pool_block=True
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        # 安装brotli后urllib3会自动支持br解码，这里按实际能力声明Accept-Encoding
+        self.session.headers.update(make_headers(keep_alive=True, accept_encoding=True))
+        self.session.headers["User-Agent"] = SCAN_CONFIG["user_agent"]
+
+        if SCAN_CONFIG["use_proxy"]:
+            self.session.proxies.update(SCAN_CONFIG["proxies"])
+        if SCAN_CONFIG["ignore_ssl_errors"]:
+            self.session.verify = False
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.stats = {"requests": 0, "connections": 0}  # 底层HTTP请求数（含重定向）、实际建立的连接数
+
+    def get(self, url, **kwargs):
+        """发送GET请求（默认使用配置中的超时和重定向策略）"""
+        kwargs.setdefault("timeout", SCAN_CONFIG["timeout"])
+        kwargs.setdefault("allow_redirects", SCAN_CONFIG["follow_redirects"])
+        with self.lock:
+            self.request_count += 1
+        return self.session.get(url, **kwargs)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        """连接复用统计：底层请求数、新建连接数、复用率"""
+        with self.lock:
+            requests_sent = self.stats["requests"]
+            new_connections = self.stats["connections"]
+        reused = max(requests_sent - new_connections, 0)
+        return {
+            "页面请求数": self.request_count,
+            "HTTP请求数(含重定向)": requests_sent,
+            "新建连接数": new_connections,
+            "复用连接请求数": reused,
+            "连接复用率": f"{reused / requests_sent:.1%}" if requests_sent else "0.0%",
+        }
+
+    def close(self):
+        self.session.close()
@@ -1,31 +1,95 @@
 import threading
-import requests
-from queue import Queue
-import time
-import os
 from .utils import extract_links, is_valid_url
-from utils import normalize_url, get_url_hash, get_domain
+from .session import HttpSession
+from .render_pool import RenderPool
+from .scheduler import HostScheduler, RateLimited, parse_retry_after
+from .frontier import CrawlState
+from .http_cache import HttpCache
+from .gate import ContentGate, CHUNK_SIZE
+from .visited import create_visited_index
+from utils import normalize_url, get_url_fingerprint, get_domain, print_stats
 from config import SCAN_CONFIG
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 
 
 class Spider:
-    def __init__(self, start_url):
+    def __init__(self, start_url, state_file=None, page_sink=None):
         self.start_url = normalize_url(start_url)
         self.base_domain = get_domain(self.start_url)
-        self.queue = Queue()
-        self.queue.put((self.start_url, 0))  # (url, depth)
-        self.visited = set()
-        self.pages = {}  # 存储URL和对应的页面内容
+        self.queue = HostScheduler()  # 按主机令牌桶限速的待爬队列
+        self.visited = create_visited_index()  # 已发现URL的64位指纹（入队时即标记，避免重复入队）
+        self.pages = {}  # 存储URL和对应的页面内容（未指定page_sink时）
+        # 流式模式：页面交给下游有界队列，爬虫本身不保留HTML
+        self.page_sink = page_sink
+        self.page_count = 0
         self.lock = threading.Lock()
+        # 持久化爬取状态（可断点续爬）
+        self.state = CrawlState(state_file) if state_file else None
+        if self.state and not self.state.is_empty():
+            self._resume()
+        else:
+            self.visited.add(get_url_fingerprint(self.start_url))
+            self._enqueue(self.start_url, 0)
         self.threads = []
         self.stop_event = threading.Event()  # 线程退出信号
+        self.http = HttpSession()  # 所有线程共享的keep-alive连接池
+        # 磁盘HTTP缓存（配置了缓存目录时启用，重复扫描用条件请求）
+        self.http_cache = HttpCache() if SCAN_CONFIG["http_cache_dir"] else None
+        self.gate = ContentGate()  # 流式下载准入（非文本/超大响应提前中止）
+        self.render_pool = None  # 动态渲染池（首次需要时创建）
+        self.stats = {}  # 爬取结束后的统计数据
+        self.retries = {}  # 因限速重新入队的次数
+
+    def _resume(self):
+        """从状态文件恢复：已完成的URL不再抓取，未完成的重新入队"""
+        pending, seen = self.state.load()
+        for url in seen:
+            self.visited.add(get_url_fingerprint(url))
+        for url, content in self.state.iter_pages():
+            self._emit_page(url, content)
+        for url, depth in pending:
+            self.queue.put((url, depth))
+        print(f"从检查点恢复: 已完成 {len(seen) - len(pending)} 个URL，待爬 {len(pending)} 个")
+
+    def _enqueue(self, url, depth):
+        """URL入队（已发现集合由调用方维护）"""
+        if self.state:
+            self.state.add_url(url, depth)
+        self.queue.put((url, depth))
+
+    def _complete(self, url, content=None, content_type=None):
+        """记录URL处理完成；HTML页面同时保存内容"""
+        if self._mark_done(url, content, content_type):
+            self._emit_page(url, content)
+
+    def _mark_done(self, url, content, content_type):
+        """在状态文件中记录URL处理完成，返回是否为需要输出的HTML页面"""
+        is_html = bool(content) and 'text/html' in (content_type or '')
+        if self.state:
+            self.state.mark_done(url, content if is_html else None, content_type)
+        return is_html
+
+    def _emit_page(self, url, content):
+        """输出页面：流式模式下放入下游队列（队列满时阻塞，形成背压），否则保存在内存中"""
+        with self.lock:
+            self.page_count += 1
+        if self.page_sink is not None:
+            self.page_sink.put((url, content))
+        else:
+            with self.lock:
+                self.pages[url] = content
 
     def crawl(self):
         """开始爬取（修复线程安全和退出机制）"""
+        try:
+            self._crawl_threads()
+        finally:
+            # 包括Ctrl-C在内，退出前都写入最后一个检查点
+            self.stop_event.set()
+            self._report_stats()
+            self.close()
+        return self.pages
+
+    def _crawl_threads(self):
         # 创建并启动线程
         for i in range(SCAN_CONFIG["max_threads"]):
             thread = threading.Thread(target=self._worker, name=f"Spider-Thread-{i+1}")
@@ -36,7 +100,7 @@ class Spider:
 
         # 等待所有任务完成
         self.queue.join()
-        print(f"所有队列任务处理完成，总爬取页面数: {len(self.pages)}")  # 调试日志
+        print(f"所有队列任务处理完成，总爬取页面数: {self.page_count}")  # 调试日志
 
         # 发送退出信号并等待线程结束
         self.stop_event.set()
@@ -44,7 +108,36 @@ class Spider:
             thread.join()
             print(f"线程 {thread.name} 已退出")  # 调试日志
 
-        return self.pages
+    def _report_stats(self):
+        """汇总并打印爬取统计"""
+        self.stats.update(self._connection_stats())
+        self.stats.update(self.queue.get_stats())
+        self.stats["已发现URL数"] = len(self.visited)
+        self.stats["已发现URL索引内存"] = f"{self.visited.memory_bytes() / 1024:.1f}KB"
+        self.stats.update(self.gate.get_stats())
+        if self.render_pool:
+            self.stats.update(self.render_pool.get_stats())
+        if self.http_cache:
+            self.stats.update(self.http_cache.get_stats())
+        if self.state:
+            self.state.flush()
+            self.stats.update(self.state.get_stats())
+        print_stats("爬取统计", self.stats)
+
+    def _connection_stats(self):
+        return self.http.get_stats()
+
+    def close(self):
+        """释放连接池和渲染浏览器"""
+        self.http.close()
+        if self.render_pool:
+            self.render_pool.close()
+        if self.http_cache:
+            self.http_cache.close()
+            self.http_cache = None
+        if self.state:
+            self.state.close()
+            self.state = None
 
     def _worker(self):
         """工作线程（修复task_done调用和退出逻辑）"""
@@ -56,94 +149,136 @@ class Spider:
             except Exception:
                 continue  # 超时后继续检查退出信号
 
+            content, content_type, requeued = None, None, False
             try:
-                url_hash = get_url_hash(url)
-
-                # 检查是否已访问或超过最大深度
-                if url_hash in self.visited or depth > SCAN_CONFIG["max_depth"]:
-                    print(f"{threading.current_thread().name} 跳过任务: 已访问或超深度")  # 调试日志
+                # 入队时已标记visited，这里只检查深度
+                if depth > SCAN_CONFIG["max_depth"]:
+                    print(f"{threading.current_thread().name} 跳过任务: 超深度")  # 调试日志
                     continue
 
-                # 加锁标记为已访问
-                with self.lock:
-                    self.visited.add(url_hash)
-                print(f"{threading.current_thread().name} 标记已访问: {url}")  # 调试日志
-
-                # 速率控制
-                time.sleep(SCAN_CONFIG["request_delay"])
-
-                # 获取页面内容
+                # 获取页面内容（速率控制由HostScheduler按主机完成）
                 content, content_type = self._fetch_page(url)
                 if not content:
                     print(f"{threading.current_thread().name} 未获取到内容: {url}")  # 调试日志
                     continue
 
-                # 存储HTML内容
-                if 'text/html' in content_type:
-                    with self.lock:
-                        self.pages[url] = content
-                    print(f"{threading.current_thread().name} 存储页面: {url}")  # 调试日志
-
-                # 提取新链接（未超深度时）
+                # 提取新链接（未超深度时），先于完成标记写入检查点
                 if depth < SCAN_CONFIG["max_depth"]:
-                    self._extract_and_enqueue_links(content, url, depth)
+                    for link in self._collect_new_links(content, url):
+                        self._enqueue(link, depth + 1)
 
+            except RateLimited as e:
+                print(f"{threading.current_thread().name} {str(e)}")  # 调试日志
+                requeued = self._requeue_rate_limited(url, depth, e.retry_after)
             except Exception as e:
                 print(f"{threading.current_thread().name} 爬取错误 {url}: {str(e)}")
             finally:
+                # 存储HTML内容并标记完成（重新入队的URL除外）
+                if not requeued:
+                    self._complete(url, content, content_type)
                 # 每个任务只调用一次task_done()
                 self.queue.task_done()
                 print(f"{threading.current_thread().name} 完成任务: {url} (剩余任务数: {self.queue.qsize()})")  # 调试日志
 
-    def _fetch_page(self, url):
+    def _requeue_rate_limited(self, url, depth, retry_after):
+        """对该主机退避，并把URL重新放回队列（其他主机不受影响）"""
+        self.queue.backoff(get_domain(url), retry_after)
+        with self.lock:
+            self.retries[url] = self.retries.get(url, 0) + 1
+            retry = self.retries[url] <= SCAN_CONFIG["max_rate_limit_retries"]
+        if retry:
+            self.queue.put((url, depth))
+        else:
+            print(f"限速重试次数已用完，放弃: {url}")  # 调试日志
+        return retry
+
+    def _check_rate_limit(self, url, status_code, headers):
+        """429，或带Retry-After的503，视为主机限速"""
+        retry_after = headers.get("retry-after")
+        if status_code == 429 or (status_code == 503 and retry_after):
+            raise RateLimited(url, parse_retry_after(retry_after))
+
+    def _handle_cache(self, url, status_code, content, headers, conditional=True):
+        """304时从缓存读取内容，200时写入缓存，返回(content, content_type)
+
+        条件请求得到304但缓存的对象文件已丢失时返回None，由调用方不带条件请求头重新获取。
+        """
+        if self.http_cache:
+            if status_code == 304:
+                cached = self.http_cache.load(url)
+                if cached or not conditional:
+                    return cached or ("", headers.get("content-type", ""))
+                return None
+            if status_code == 200:
+                self.http_cache.store(url, content, headers)
+        return content, headers.get("content-type", "")
+
+    def _fetch_page(self, url, conditional=True):
         """获取页面内容（静态+动态渲染）"""
         try:
-            # 静态请求
-            headers = {"User-Agent": SCAN_CONFIG["user_agent"]}
-            response = requests.get(url, headers=headers, timeout=SCAN_CONFIG["timeout"])
-            print(f"静态请求成功: {url} (状态码: {response.status_code})")  # 调试日志
-            return response.text, response.headers.get("content-type", "")
+            # 静态请求（复用连接池，有缓存时发送条件请求头）
+            headers = self.http_cache.conditional_headers(url) if self.http_cache and conditional else {}
+            with self.http.get(url, headers=headers, stream=True) as response:
+                print(f"静态请求成功: {url} (状态码: {response.status_code})")  # 调试日志
+                self._check_rate_limit(url, response.status_code, response.headers)
+                if response.status_code == 304:
+                    cached = self._handle_cache(url, 304, "", response.headers, conditional)
+                    if cached is not None:
+                        return cached
+                else:
+                    reader = self.gate.open(url, response.headers)
+                    if reader.accepting:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            if not reader.feed(chunk):
+                                break
+                    content = reader.close()
+                    if content is None:
+                        return None, reader.content_type
+                    return self._handle_cache(url, response.status_code, content, response.headers)
+            # 缓存内容已丢失：不带条件请求头重新获取完整页面（不能把304当作空页面）
+            return self._fetch_page(url, conditional=False)
+        except RateLimited:
+            raise
         except Exception as e:
             print(f"静态请求失败 {url}: {str(e)}，尝试动态渲染...")  # 调试日志
             if SCAN_CONFIG["enable_js_rendering"]:
-                try:
-                    chrome_options = Options()
-                    chrome_options.add_argument("--headless=new")
-                    chrome_options.add_argument("--disable-gpu")
-                    chrome_options.add_argument("--no-sandbox")  # 增加兼容性
-                    chrome_options.add_argument("--disable-dev-shm-usage")  # 解决内存问题
-
-                    service = Service(ChromeDriverManager().install())
-                    driver = webdriver.Chrome(service=service, options=chrome_options)
-                    driver.get(url)
-                    time.sleep(SCAN_CONFIG["js_render_delay"])
-                    content = driver.page_source
-                    driver.quit()
-                    print(f"动态渲染成功: {url}")  # 调试日志
-                    return content, "text/html"
-                except Exception as e:
-                    print(f"动态渲染失败 {url}: {str(e)}")
+                return self._render_page(url)
         return None, None
 
-    def _extract_and_enqueue_links(self, content, base_url, current_depth):
-        """提取链接并加入队列（增加调试日志）"""
+    def _render_page(self, url):
+        """使用渲染池中的无头浏览器渲染页面（静态请求失败时的回退方案）"""
+        with self.lock:
+            if self.render_pool is None:
+                self.render_pool = RenderPool()
+        try:
+            content, content_type = self.render_pool.render(url)
+            print(f"动态渲染成功: {url}")  # 调试日志
+            return content, content_type
+        except Exception as e:
+            print(f"动态渲染失败 {url}: {str(e)}")
+        return None, None
+
+    def _collect_new_links(self, content, base_url):
+        """提取链接，返回未发现过且符合扫描条件的新链接（已标记为visited）"""
         links = extract_links(content, base_url)
         print(f"从 {base_url} 提取到 {len(links)} 个原始链接")  # 调试日志
 
-        valid_links = 0
+        new_links = []
         for link in links:
+            # 每个链接只标准化、计算指纹各一次
             normalized_link = normalize_url(link)
-            link_hash = get_url_hash(normalized_link)
 
             # 检查链接有效性
-            if (link_hash not in self.visited and
-                    is_valid_url(normalized_link, self.base_domain,
-                                 SCAN_CONFIG["allowed_domains"],
-                                 SCAN_CONFIG["exclude_paths"])):
-                with self.lock:
-                    self.visited.add(link_hash)
-                self.queue.put((normalized_link, current_depth + 1))
-                valid_links += 1
-                print(f"加入队列: {normalized_link} (新深度: {current_depth + 1})")  # 调试日志
-
-        print(f"从 {base_url} 筛选出 {valid_links} 个有效链接加入队列")  # 调试日志
\ No newline at end of file
+            if not is_valid_url(normalized_link, self.base_domain,
+                                SCAN_CONFIG["allowed_domains"],
+                                SCAN_CONFIG["exclude_paths"]):
+                continue
+            fingerprint = get_url_fingerprint(normalized_link)
+            # add()同时完成检查和标记，需持锁避免多个线程重复入队
+            with self.lock:
+                if not self.visited.add(fingerprint):
+                    continue
+            new_links.append(normalized_link)
+
+        print(f"从 {base_url} 筛选出 {len(new_links)} 个有效链接加入队列")  # 调试日志
+        return new_links
@@ -1,41 +1,97 @@
 import re
-from urllib.parse import urlparse, urljoin
+from html import unescape
+from urllib.parse import urlparse, urljoin, urlsplit, urlunsplit
+
+
+# 一次扫描提取所有链接类标签（替代原先a/iframe/frame三次全文扫描）
+# = 之后的引号属性值整体匹配：srcdoc="<a href=/x>y</a>" 中的 > 不会提前结束标签；
+# 缺少 > 的标签匹配到文本末尾（随后忽略），使匹配不会失败回溯（否则每个未闭合的标签都要扫描到文本末尾）
+LINK_TAG_PATTERN = re.compile(
+    r'<(?P<tag>a|area|iframe|frame|base)\b(?P<attrs>(?:=\s*"[^"]*"|=\s*\'[^\']*\'|[^>])*)(?:(?P<end>>)|\Z)',
+    re.IGNORECASE
+)
+# JS中的跳转目标（JS区分大小写；仅在页面包含对应字面量时才扫描）
+JS_TARGET_PATTERNS = (
+    ('window.open', re.compile(r'window\.open\s*\(\s*(["\'])([^"\'\s]+)\1')),
+    # 左边界：mylocation = / obj.relocation = 不是跳转
+    ('location', re.compile(r'(?<![\w$])location(?:\.href)?\s*=\s*(["\'])([^"\'\s]+)\1')),
+)
+LINK_ATTR_PATTERN = re.compile(
+    r'\b(?P<name>href|src|srcdoc)\s*=\s*(?:"(?P<dq>[^"]*)"|\'(?P<sq>[^\']*)\'|(?P<uq>[^\s"\'>]+))',
+    re.IGNORECASE
+)
+SKIP_PREFIXES = ('#', 'javascript:', 'mailto:', 'tel:', 'data:', 'about:')
 
 
 def extract_links(html, base_url):
-    """从HTML中提取所有链接"""
-    links = []
-
-    # 提取a标签href
-    a_pattern = re.compile(r'<a[^>]+href=["\']([^"\']+)["\']', re.IGNORECASE)
-    for match in a_pattern.findall(html):
-        if match.startswith(('http://', 'https://')):
-            links.append(match)
-        elif match.startswith('#'):
-            continue  # 跳过锚点链接
-        else:
-            absolute_url = urljoin(base_url, match)
-            links.append(absolute_url)
-
-    # 提取iframe src
-    iframe_pattern = re.compile(r'<iframe[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
-    for match in iframe_pattern.findall(html):
-        if match.startswith(('http://', 'https://')):
-            links.append(match)
-        else:
-            absolute_url = urljoin(base_url, match)
-            links.append(absolute_url)
-
-    # 提取frame src
-    frame_pattern = re.compile(r'<frame[^>]+src=["\']([^"\']+)["\']', re.IGNORECASE)
-    for match in frame_pattern.findall(html):
-        if match.startswith(('http://', 'https://')):
-            links.append(match)
-        else:
-            absolute_url = urljoin(base_url, match)
-            links.append(absolute_url)
-
-    return links
+    """单次扫描HTML提取链接（a/area/iframe/frame、srcdoc、window.open、location=），页面内去重"""
+    raw_links = {}  # 保持出现顺序的去重
+    base_href = _scan_links(html, raw_links)
+    if base_href:
+        base_url = urljoin(base_url, base_href)
+
+    resolver = _BaseResolver(base_url)
+    links = {}
+    for raw in raw_links:
+        links[resolver.resolve(raw)] = None
+    return list(links)
+
+
+def _scan_links(html, raw_links):
+    """收集原始链接，返回第一个<base href>（srcdoc中的内容递归处理）"""
+    base_href = None
+    for match in LINK_TAG_PATTERN.finditer(html):
+        if match.group('end') is None:
+            break  # 直到文本末尾都没有闭合的标签，浏览器同样忽略
+        tag = match.group('tag').lower()
+        for attr in LINK_ATTR_PATTERN.finditer(match.group('attrs')):
+            value = attr.group('dq')
+            if value is None:
+                value = attr.group('sq') if attr.group('sq') is not None else attr.group('uq')
+            name = attr.group('name').lower()
+            if name == 'srcdoc':
+                if tag == 'iframe':
+                    _scan_links(unescape(value), raw_links)
+                continue
+            value = unescape(value.strip())
+            if tag == 'base':
+                if name == 'href' and base_href is None:
+                    base_href = value
+                continue
+            if (name == 'href') != (tag in ('a', 'area')):
+                continue  # a/area取href，iframe/frame取src
+            if value and not value.lower().startswith(SKIP_PREFIXES):
+                raw_links[value] = None
+
+    # 字面量预检查很快，绝大多数页面不需要额外的正则扫描
+    for literal, pattern in JS_TARGET_PATTERNS:
+        if literal in html:
+            for _, target in pattern.findall(html):
+                if not target.lower().startswith(SKIP_PREFIXES):
+                    raw_links[target] = None
+    return base_href
+
+
+class _BaseResolver:
+    """基于一次解析好的基准URL拼接相对链接，常见形式不再重复调用urljoin"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        parsed = urlsplit(base_url)
+        self.origin = f"{parsed.scheme}://{parsed.netloc}"
+        self.scheme = parsed.scheme
+        self.base_no_query = urlunsplit((parsed.scheme, parsed.netloc, parsed.path, '', ''))
+
+    def resolve(self, link):
+        if link.startswith(('http://', 'https://')):
+            return link
+        if link.startswith('//'):
+            return f"{self.scheme}:{link}"
+        if link.startswith('/') and '/.' not in link:
+            return self.origin + link
+        if link.startswith('?'):
+            return self.base_no_query + link
+        return urljoin(self.base_url, link)
 
 
 def is_valid_url(url, base_domain, allowed_domains, exclude_paths):
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import math
+from array import array
+from config import SCAN_CONFIG
+
+
+class VisitedIndex:
+    """紧凑的已访问URL集合：64位指纹 + array('Q')开放寻址哈希表（线性探测）
+
+    每个URL约占 8 / 装载因子 字节，而set中的MD5十六进制字符串每个约100字节。
+    指纹冲突概率约为 n²/2⁶⁵，千万级URL时仍可忽略。
+    """
+
+    MAX_LOAD = 0.7
+
+    def __init__(self, capacity=1024):
+        size = 1
+        while size < capacity / self.MAX_LOAD:
+            size <<= 1
+        self.table = array('Q', bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def add(self, fingerprint):
+        """加入指纹，返回True表示此前不存在（检查与插入一步完成）"""
+        fingerprint = fingerprint or 1  # 0 表示空槽位
+        table, mask = self.table, self.mask
+        slot = fingerprint & mask
+        while True:
+            value = table[slot]
+            if value == 0:
+                break
+            if value == fingerprint:
+                return False
+            slot = (slot + 1) & mask
+        table[slot] = fingerprint
+        self.count += 1
+        if self.count > self.MAX_LOAD * len(table):
+            self._grow()
+        return True
+
+    def __contains__(self, fingerprint):
+        fingerprint = fingerprint or 1
+        table, mask = self.table, self.mask
+        slot = fingerprint & mask
+        while True:
+            value = table[slot]
+            if value == 0:
+                return False
+            if value == fingerprint:
+                return True
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        old = self.table
+        self.table = array('Q', bytes(16 * len(old)))
+        self.mask = len(self.table) - 1
+        self.count = 0
+        for value in old:
+            if value:
+                self.add(value)
+
+    def __len__(self):
+        return self.count
+
+    def memory_bytes(self):
+        return self.table.itemsize * len(self.table)
+
+
+class BloomFilter:
+    """可扩容的布隆过滤器（概率模式），误判率不超过error_rate
+
+    误判表现为把新URL当成已访问而跳过，不会重复抓取。当前分片装满时追加一个容量翻倍、
+    误判率减半的新分片，使总误判率收敛在error_rate以内。
+    """
+
+    def __init__(self, capacity=None, error_rate=None):
+        self.capacity = capacity or SCAN_CONFIG["bloom_capacity"]
+        self.error_rate = error_rate or SCAN_CONFIG["bloom_error_rate"]
+        self.slices = []
+        self.count = 0
+        self._add_slice(self.capacity, self.error_rate / 2)
+
+    def _add_slice(self, capacity, error_rate):
+        bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hashes = max(1, int(round(bits / capacity * math.log(2))))
+        self.slices.append({
+            "bits": bytearray((bits + 7) // 8), "size": bits,
+            "hashes": hashes, "capacity": capacity, "count": 0, "error_rate": error_rate
+        })
+
+    @staticmethod
+    def _positions(fingerprint, size, hashes):
+        # 双重哈希：由64位指纹的高低32位派生k个位置
+        h1 = fingerprint & 0xFFFFFFFF
+        h2 = (fingerprint >> 32) | 1
+        return [(h1 + i * h2) % size for i in range(hashes)]
+
+    def __contains__(self, fingerprint):
+        for s in self.slices:
+            bits = s["bits"]
+            if all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(fingerprint, s["size"], s["hashes"])):
+                return True
+        return False
+
+    def add(self, fingerprint):
+        """加入指纹，返回True表示此前（很可能）不存在"""
+        if fingerprint in self:
+            return False
+        current = self.slices[-1]
+        if current["count"] >= current["capacity"]:
+            self._add_slice(current["capacity"] * 2, current["error_rate"] / 2)
+            current = self.slices[-1]
+        bits = current["bits"]
+        for p in self._positions(fingerprint, current["size"], current["hashes"]):
+            bits[p >> 3] |= 1 << (p & 7)
+        current["count"] += 1
+        self.count += 1
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def memory_bytes(self):
+        return sum(len(s["bits"]) for s in self.slices)
+
+
+def create_visited_index():
+    """按配置创建已访问集合（exact: 精确指纹表 / bloom: 布隆过滤器）"""
+    if SCAN_CONFIG["visited_mode"] == "bloom":
+        return BloomFilter()
+    return VisitedIndex()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import hashlib
+import json
+import sqlite3
+import threading
+from utils import print_stats
+
+# 每积累这么多次写入提交一次事务
+COMMIT_BATCH = 100
+
+
+class IncrementalState:
+    """增量扫描状态（SQLite）：每个URL的内容哈希、处理函数指纹、检测结果，以及验证结果
+
+    再次扫描时，内容哈希未变化的页面直接复用上次的检测结果（不再分析）；已验证过的
+    处理函数（同一URL、同一处理函数/调用、同一漏洞类型）直接复用上次的验证结果，
+    不再启动浏览器。扫描结束时输出与上次相比新增、变化、移除的页面。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                handlers TEXT NOT NULL,
+                findings TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS validations (
+                url TEXT NOT NULL,
+                unit TEXT NOT NULL,
+                type TEXT NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (url, unit, type)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+        self.lock = threading.Lock()
+        # 上次扫描的页面 url -> (内容哈希, 处理函数指纹列表)
+        self.previous = {
+            url: (content_hash, json.loads(handlers))
+            for url, content_hash, handlers in self.conn.execute("SELECT url, content_hash, handlers FROM pages")
+        }
+        self.status = {}  # 本次扫描到的页面 url -> new / changed / unchanged
+        self.handler_changes = {"added": 0, "removed": 0}
+        self.writes = 0
+        self.stats = {"reused_pages": 0, "reused_validations": 0, "validations": 0}
+
+    @staticmethod
+    def content_hash(html):
+        return hashlib.sha256(html.encode("utf-8", "surrogatepass")).hexdigest()
+
+    @staticmethod
+    def _handlers(findings):
+        return sorted({finding["handler_fingerprint"] for finding in findings if "handler_fingerprint" in finding})
+
+    def lookup(self, url, html):
+        """返回 (内容哈希, 上次的检测结果)；页面是新的或内容已变化时检测结果为None"""
+        digest = self.content_hash(html)
+        previous = self.previous.get(url)
+        with self.lock:
+            if previous is None:
+                self.status[url] = "new"
+                return digest, None
+            if previous[0] != digest:
+                self.status[url] = "changed"
+                return digest, None
+            self.status[url] = "unchanged"
+            self.stats["reused_pages"] += 1
+            row = self.conn.execute("SELECT findings FROM pages WHERE url = ?", (url,)).fetchone()
+        return digest, json.loads(row[0])
+
+    def store(self, url, digest, findings):
+        """保存页面的检测结果（不含验证结果），变化的页面同时统计处理函数的增减"""
+        handlers = self._handlers(findings)
+        with self.lock:
+            previous = self.previous.get(url)
+            if previous is not None and previous[0] != digest:
+                old, new = set(previous[1]), set(handlers)
+                self.handler_changes["added"] += len(new - old)
+                self.handler_changes["removed"] += len(old - new)
+            findings = [{key: value for key, value in finding.items() if key != "exploit"} for finding in findings]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, content_hash, handlers, findings) VALUES (?, ?, ?, ?)",
+                (url, digest, json.dumps(handlers), json.dumps(findings, ensure_ascii=False))
+            )
+            self._maybe_commit()
+
+    @staticmethod
+    def _unit(vulnerability):
+        """漏洞所属的处理函数/调用：优先使用处理函数指纹，否则用代码片段（或描述）的哈希"""
+        if "handler_fingerprint" in vulnerability:
+            return vulnerability["handler_fingerprint"]
+        text = vulnerability.get("code_snippet") or vulnerability.get("description", "")
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+    def lookup_validation(self, url, vulnerability):
+        """上次对同一处理函数/调用的验证结果，没有验证过返回None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM validations WHERE url = ? AND unit = ? AND type = ?",
+                (url, self._unit(vulnerability), vulnerability["type"])
+            ).fetchone()
+            if row:
+                self.stats["reused_validations"] += 1
+        return json.loads(row[0]) if row else None
+
+    def store_validation(self, url, vulnerability, result):
+        with self.lock:
+            self.stats["validations"] += 1
+            self.conn.execute(
+                "INSERT OR REPLACE INTO validations (url, unit, type, result) VALUES (?, ?, ?, ?)",
+                (url, self._unit(vulnerability), vulnerability["type"], json.dumps(result, ensure_ascii=False))
+            )
+            self._maybe_commit()
+
+    def _maybe_commit(self):
+        self.writes += 1
+        if self.writes % COMMIT_BATCH == 0:
+            self.conn.commit()
+
+    def finish(self, crawl_scope=None):
+        """提交并返回与上次相比的差异
+
+        crawl_scope为本次完整爬取的 (起始URL, 最大深度)，单页扫描或爬取未完成时为None。
+        只有完整爬取且范围覆盖上次删除页面时的范围（同一起始URL、深度不更小）时，本次未扫描到的
+        页面才视为已移除并删除（及其验证结果）；否则这些页面只是没有扫描到，保留上次的状态。
+        """
+        with self.lock:
+            missing = sorted(set(self.previous) - set(self.status))
+            removed, unscanned = [], missing
+            if self._covers(crawl_scope):
+                removed, unscanned = missing, []
+                for url in removed:
+                    self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                    self.conn.execute("DELETE FROM validations WHERE url = ?", (url,))
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('crawl_scope', ?)",
+                                  (json.dumps(list(crawl_scope)),))
+            self.conn.commit()
+            diff = {"new": [], "changed": [], "unchanged": [], "removed": removed, "unscanned": unscanned}
+            for url, status in self.status.items():
+                diff[status].append(url)
+        return diff
+
+    def _covers(self, crawl_scope):
+        """本次完整爬取的范围是否覆盖上次删除页面时记录的范围（没有记录时视为覆盖）"""
+        if crawl_scope is None:
+            return False
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'crawl_scope'").fetchone()
+        if not row:
+            return True
+        start_url, max_depth = json.loads(row[0])
+        return crawl_scope[0] == start_url and crawl_scope[1] >= max_depth
+
+    def print_diff(self, diff, limit=20):
+        """输出增量扫描的差异（每类最多列出limit个URL）"""
+        print_stats("增量扫描对比", {
+            "新增页面": len(diff["new"]),
+            "内容变化的页面": len(diff["changed"]),
+            "未变化的页面(复用检测结果)": len(diff["unchanged"]),
+            "已移除的页面": len(diff["removed"]),
+            "本次未扫描到的页面(保留上次状态)": len(diff["unscanned"]),
+            "变化页面中新增/移除的处理函数": f"{self.handler_changes['added']} / {self.handler_changes['removed']}",
+            "复用的验证结果": self.stats["reused_validations"],
+            "新执行的验证": self.stats["validations"],
+        })
+        for mark, key in (("+", "new"), ("~", "changed"), ("-", "removed")):
+            for url in sorted(diff[key])[:limit]:
+                print(f"    [{mark}] {url}")
+            if len(diff[key]) > limit:
+                print(f"    [{mark}] ... 另有 {len(diff[key]) - limit} 个")
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
@@ -1,12 +1,13 @@
 import os
 import sys
 import argparse
-from tqdm import tqdm  # 需安装tqdm
 from crawler.spider import Spider
-from analyzer.detector import PostMessageVulnerabilityDetector
-from validator.exploit import PostMessageExploiter
+from pipeline import AnalysisPipeline
+from incremental import IncrementalState
+from validator.scheduler import ValidationScheduler
 from repoter.report import ReportGenerator
 from config import SCAN_CONFIG, REPORT_CONFIG
+from utils import print_stats
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -18,7 +19,23 @@ def main():
     parser.add_argument('--no-exploit', action='store_true', help='不进行漏洞验证')
     parser.add_argument('--max-depth', type=int, help=f'爬虫最大深度(默认: {SCAN_CONFIG["max_depth"]})')
     parser.add_argument('--threads', type=int, help=f'线程数(默认: {SCAN_CONFIG["max_threads"]})')
+    parser.add_argument('--engine', choices=['thread', 'async'],
+                        help=f'爬虫引擎(thread/async, 默认: {SCAN_CONFIG["engine"]})')
+    parser.add_argument('--concurrency', type=int,
+                        help=f'async引擎并发数(默认: {SCAN_CONFIG["async_concurrency"]})')
+    parser.add_argument('--analysis-workers', type=int, metavar='N',
+                        help=f'分析进程数，>1时多核并行分析(默认: {SCAN_CONFIG["analysis_workers"]})')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='记录分析各阶段耗时，扫描结束时输出统计表并写入该JSON文件')
+    parser.add_argument('--validate-workers', type=int, metavar='N',
+                        help=f'并行验证的浏览器数，高危漏洞优先验证(默认: {SCAN_CONFIG["validate_workers"]})')
     parser.add_argument('--report-format', help=f'报告格式(html/json/txt/pdf, 默认: {REPORT_CONFIG["format"]})')
+    parser.add_argument('--resume', metavar='STATE_FILE',
+                        help='爬取状态保存到该SQLite文件；文件已存在时从上次检查点继续爬取')
+    parser.add_argument('--incremental', metavar='STATE_DB',
+                        help='增量扫描状态文件(SQLite)：内容未变化的页面复用上次的检测结果，已验证的处理函数不再验证')
+    parser.add_argument('--http-cache', metavar='DIR',
+                        help='启用磁盘HTTP缓存，重复扫描时未变化的页面由304直接读取本地内容')
     parser.add_argument('--proxy', help='代理服务器(如http://127.0.0.1:8080)')
     parser.add_argument('--headless', action='store_true', help='浏览器无头模式')
     args = parser.parse_args()
@@ -28,8 +45,20 @@ def main():
         SCAN_CONFIG["max_depth"] = args.max_depth
     if args.threads:
         SCAN_CONFIG["max_threads"] = args.threads
+    if args.engine:
+        SCAN_CONFIG["engine"] = args.engine
+    if args.concurrency:
+        SCAN_CONFIG["async_concurrency"] = args.concurrency
+    if args.analysis_workers:
+        SCAN_CONFIG["analysis_workers"] = args.analysis_workers
+    if args.metrics:
+        SCAN_CONFIG["metrics_file"] = args.metrics
+    if args.validate_workers:
+        SCAN_CONFIG["validate_workers"] = args.validate_workers
     if args.report_format:
         REPORT_CONFIG["format"] = args.report_format
+    if args.http_cache:
+        SCAN_CONFIG["http_cache_dir"] = args.http_cache
     if args.proxy:
         SCAN_CONFIG["use_proxy"] = True
         SCAN_CONFIG["proxies"] = {"http": args.proxy, "https": args.proxy}
@@ -40,40 +69,43 @@ def main():
     print(f"开始扫描目标: {args.url}".center(50))
     print("=" * 50 + "\n")
 
-    # 爬取网站（带进度条）
+    # 爬取与分析流水线：页面抓取后立即分析，漏洞实时输出
+    incremental = IncrementalState(args.incremental) if args.incremental else None
+    pipeline = AnalysisPipeline(incremental=incremental).start()
+    crawl_scope = None  # 完整爬取的范围（起始URL, 最大深度）；单页扫描时为None，增量状态不删除未扫描到的页面
     if args.no_crawl:
         spider = Spider(args.url)
         response = spider._fetch_page(args.url)
-        pages = {args.url: response[0]} if response[0] else {}
+        if response[0]:
+            pipeline.queue.put((args.url, response[0]))
+        spider.close()
         print(f"[+] 已加载单个页面: {args.url}")
     else:
-        spider = Spider(args.url)
-        print("[*] 开始爬取网站...")
-        pages = spider.crawl()
-        print(f"[+] 爬取完成，共获取 {len(pages)} 个页面")
+        if SCAN_CONFIG["engine"] == "async":
+            from crawler.async_spider import AsyncSpider  # 可选依赖aiohttp，按需导入
+            spider = AsyncSpider(args.url, state_file=args.resume, page_sink=pipeline.queue)
+        else:
+            spider = Spider(args.url, state_file=args.resume, page_sink=pipeline.queue)
+        print("[*] 开始爬取并分析网站...")
+        spider.crawl()  # Ctrl-C时抛出KeyboardInterrupt，不会执行到增量状态的finish()
+        crawl_scope = (args.url, SCAN_CONFIG["max_depth"])
+        print(f"[+] 爬取完成，共获取 {spider.page_count} 个页面")
 
-    # 分析漏洞（带进度条）
-    results = {}
-    print("\n[*] 开始分析漏洞...")
-    for url in tqdm(pages.keys(), desc="分析页面"):
-        html = pages[url]
-        detector = PostMessageVulnerabilityDetector(url, html)
-        vulnerabilities = detector.analyze()
-        if vulnerabilities:
-            results[url] = vulnerabilities
-            # 显示找到的漏洞数量
-            tqdm.write(f"[!] 在 {url} 发现 {len(vulnerabilities)} 个潜在漏洞")
+    results = pipeline.finish()
+    print(f"[+] 分析完成，{len(results)} 个页面存在潜在漏洞")
 
     # 漏洞验证
     if not args.no_exploit and results:
         print("\n[*] 开始验证漏洞...")
-        for url in tqdm(results.keys(), desc="验证漏洞"):
-            for i, vuln in enumerate(results[url]):
-                exploiter = PostMessageExploiter()
-                exploit_result = exploiter.test_vulnerability(url, vuln)
-                if exploit_result and exploit_result['exploitable']:
-                    results[url][i]['exploit'] = exploit_result
-                    tqdm.write(f"[!] 已验证 {url} 存在可利用漏洞")
+        # 验证任务按严重程度排序后分配给多个常驻浏览器，每个漏洞借用一个标签页，用完重置状态
+        scheduler = ValidationScheduler(incremental=incremental)
+        scheduler.run(results)
+        print_stats("漏洞验证统计", scheduler.get_stats())
+        print_stats("验证浏览器池统计", scheduler.browser_pool.get_stats())
+
+    if incremental:
+        incremental.print_diff(incremental.finish(crawl_scope))
+        incremental.close()
 
     # 生成报告
     print("\n[*] 生成扫描报告...")
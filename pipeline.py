@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import os
+import time
+import heapq
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from queue import Queue, Empty
+from tqdm import tqdm  # 需安装tqdm
+from analyzer.detector import PostMessageVulnerabilityDetector
+from analyzer.rules import rule_counters, get_rule_stats
+from analyzer.prefilter import prefilter_counters, get_prefilter_stats
+from analyzer import metrics
+from analyzer.script_cache import ScriptCache
+from analyzer.findings_cache import FindingsCache
+from config import SCAN_CONFIG
+from utils import print_stats
+
+
+def analyze_page(url, html, script_cache=None, findings_cache=None):
+    """分析单个页面，返回 (漏洞列表, 是否超出时间预算的部分结果)（传入script_cache时包括外部脚本中的漏洞）"""
+    with metrics.timer("analyze_page"):
+        detector = PostMessageVulnerabilityDetector(url, html, script_cache=script_cache, findings_cache=findings_cache)
+        vulnerabilities = detector.analyze()
+        return vulnerabilities, detector.partial
+
+
+def _snapshot_stats(script_cache, findings_cache):
+    """当前进程的累计统计（阶段计时、规则计数和缓存计数）"""
+    return {
+        "stages": metrics.stage_counters(),
+        "rules": rule_counters(),
+        "prefilter": prefilter_counters(),
+        "findings": findings_cache.raw_stats(),
+        "scripts": script_cache.raw_stats() if script_cache else None,
+    }
+
+
+def _merge_stats(snapshots):
+    """汇总各工作进程的统计"""
+    merged = {"stages": {}, "rules": {}, "prefilter": {}, "findings": {}, "scripts": None}
+    for snapshot in snapshots:
+        metrics.merge_stage_counters(merged["stages"], snapshot["stages"])
+        for name, counters in snapshot["rules"].items():
+            total = merged["rules"].setdefault(name, [0] * len(counters))
+            for i, value in enumerate(counters):
+                total[i] += value
+        for group in ("prefilter", "findings"):
+            for key, value in snapshot[group].items():
+                merged[group][key] = merged[group].get(key, 0) + value
+        if snapshot["scripts"]:
+            merged["scripts"] = merged["scripts"] or {}
+            for key, value in snapshot["scripts"].items():
+                merged["scripts"][key] = merged["scripts"].get(key, 0) + value
+    return merged
+
+
+# 工作进程内的缓存（每个进程一份，由_init_worker创建）
+_worker_caches = {}
+
+
+def _init_worker(config):
+    """进程池初始化：同步主进程的配置（可能已被命令行参数覆盖），建立本进程的缓存"""
+    SCAN_CONFIG.update(config)
+    metrics.set_enabled(bool(SCAN_CONFIG["metrics_file"]))
+    _worker_caches["script"] = ScriptCache() if SCAN_CONFIG["analyze_external_scripts"] else None
+    _worker_caches["findings"] = FindingsCache()
+
+
+def _analyze_chunk(chunk):
+    """在工作进程中分析一批页面，返回 ([(url, 漏洞列表, 是否部分结果, 错误信息, 耗时)], (pid, 本进程累计统计))"""
+    script_cache, findings_cache = _worker_caches["script"], _worker_caches["findings"]
+    results = []
+    for url, html in chunk:
+        start = time.perf_counter()
+        try:
+            (vulnerabilities, partial), error = analyze_page(url, html, script_cache, findings_cache), None
+        except Exception as e:
+            vulnerabilities, partial, error = [], False, str(e)
+        results.append((url, vulnerabilities, partial, error, time.perf_counter() - start))
+    return results, (os.getpid(), _snapshot_stats(script_cache, findings_cache))
+
+
+class AnalysisPipeline:
+    """爬取→分析流水线：爬虫把页面放入有界队列，分析线程逐页消费
+
+    每个页面抓取后立即分析，记录漏洞后即丢弃HTML，内存峰值只取决于队列长度；
+    发现的漏洞实时输出，无需等待爬取结束。
+    workers>1时分析在进程池中进行：页面按HTML字节数分块提交（减少进程间传递的次数），
+    结果按提交顺序记录，results的顺序和结构与单进程相同。
+    传入incremental（IncrementalState）时，内容未变化的页面直接复用上次的检测结果。
+    """
+
+    def __init__(self, maxsize=None, workers=None, incremental=None):
+        self.queue = Queue(maxsize=maxsize or SCAN_CONFIG["pipeline_queue_size"])
+        self.workers = workers or SCAN_CONFIG["analysis_workers"]
+        self.results = {}
+        self.thread = None
+        self.progress = None
+        self.executor = None
+        self.worker_stats = {}  # 工作进程pid -> 最近一次返回的累计统计
+        self.slowest = []  # 最慢页面的小顶堆 (耗时, url, 是否部分结果)
+        self.partial_pages = []  # 超出分析时间预算（结果不完整）的页面，与漏洞结果分开记录
+        self.incremental = incremental
+        metrics.set_enabled(bool(SCAN_CONFIG["metrics_file"]))
+        self.digests = {}  # 正在分析的页面 url -> 内容哈希（分析完成后保存到增量状态）
+        if self.workers > 1:
+            self.script_cache = self.findings_cache = None  # 缓存在各工作进程中
+        else:
+            # 外部脚本缓存在整个扫描中共享
+            self.script_cache = ScriptCache() if SCAN_CONFIG["analyze_external_scripts"] else None
+            self.findings_cache = FindingsCache()
+
+    def start(self):
+        self.progress = tqdm(desc="分析页面", unit="页")
+        target = self._consume
+        if self.workers > 1:
+            # spawn而不是fork：爬虫线程运行期间fork可能复制到被持有的锁
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(dict(SCAN_CONFIG),)
+            )
+            target = self._consume_parallel
+        self.thread = threading.Thread(target=target, name="Analyzer-Thread", daemon=True)
+        self.thread.start()
+        return self
+
+    def _consume(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            url, html = item
+            del item
+            reused = self._reuse(url, html)
+            if reused is not None:
+                self._record(url, reused)
+                self.progress.update(1)
+                continue
+            start = time.perf_counter()
+            try:
+                vulnerabilities, partial = analyze_page(url, html, self.script_cache, self.findings_cache)
+            except Exception as e:
+                tqdm.write(f"[!] 分析失败 {url}: {str(e)}")
+                vulnerabilities, partial = [], False
+                self.digests.pop(url, None)  # 分析失败的结果不保存
+            del html  # 漏洞已记录，释放HTML
+            self._record(url, vulnerabilities, time.perf_counter() - start, partial)
+            self.progress.update(1)
+
+    def _reuse(self, url, html):
+        """增量模式下内容未变化的页面返回上次的检测结果，否则记下内容哈希并返回None"""
+        if self.incremental is None:
+            return None
+        with metrics.timer("incremental_lookup"):
+            digest, findings = self.incremental.lookup(url, html)
+        if findings is None:
+            self.digests[url] = digest
+        return findings
+
+    def _consume_parallel(self):
+        """从队列取页面凑成分块提交到进程池，按提交顺序取回结果"""
+        chunk_bytes = SCAN_CONFIG["analysis_chunk_kb"] * 1024
+        pending = deque()  # (分块中的URL, future)
+        finished = False
+        while not finished:
+            try:
+                item = self.queue.get(timeout=0.2 if pending else None)
+            except Empty:
+                self._collect_done(pending)
+                continue
+
+            # 队列中已有的页面凑成一块，达到字节上限或队列暂时为空就提交，不等待后续页面
+            chunk, size = [], 0
+            while True:
+                if item is None:
+                    finished = True
+                    break
+                reused = self._reuse(*item)
+                if reused is not None:
+                    # 复用的结果排在已凑好的分块之后，保持记录顺序
+                    self._submit(pending, chunk)
+                    chunk, size = [], 0
+                    done = Future()
+                    done.set_result(([(item[0], reused, False, None, None)], None))
+                    pending.append(([item[0]], done))
+                else:
+                    chunk.append(item)
+                    size += len(item[1])
+                    if size >= chunk_bytes:
+                        break
+                try:
+                    item = self.queue.get_nowait()
+                except Empty:
+                    break
+
+            self._submit(pending, chunk)
+            del chunk, item  # 已交给进程池，释放HTML
+            self._collect_done(pending)
+
+        while pending:
+            self._collect(*pending.popleft())
+
+    def _submit(self, pending, chunk):
+        if not chunk:
+            return
+        while len(pending) >= self.workers * 2:  # 限制在途分块数，队列满时形成背压
+            self._collect(*pending.popleft())
+        urls = [url for url, _ in chunk]
+        pending.append((urls, self.executor.submit(_analyze_chunk, chunk)))
+
+    def _collect_done(self, pending):
+        """按顺序取回已完成的分块（队首未完成时不越过它，保证结果顺序）"""
+        while pending and pending[0][1].done():
+            self._collect(*pending.popleft())
+
+    def _collect(self, urls, future):
+        try:
+            page_results, worker_stats = future.result()
+        except Exception as e:
+            tqdm.write(f"[!] 分析进程出错: {str(e)}")
+            page_results = [(url, [], False, str(e), 0.0) for url in urls]
+        else:
+            if worker_stats:  # 复用增量结果的伪分块没有统计
+                pid, stats = worker_stats
+                self.worker_stats[pid] = stats
+        for url, vulnerabilities, partial, error, elapsed in page_results:
+            if error:
+                tqdm.write(f"[!] 分析失败 {url}: {error}")
+                self.digests.pop(url, None)  # 分析失败的结果不保存
+            self._record(url, vulnerabilities, elapsed, partial)
+            self.progress.update(1)
+
+    def _record(self, url, vulnerabilities, elapsed=None, partial=False):
+        """记录并实时输出漏洞，同时记录最慢的页面（elapsed为None表示复用了增量结果，没有分析）"""
+        digest = self.digests.pop(url, None)
+        if digest and not partial:  # 部分结果不保存，下次扫描重新分析
+            self.incremental.store(url, digest, vulnerabilities)
+        if partial:
+            self.partial_pages.append(url)
+            tqdm.write(f"[!] {url} 分析超出时间预算（{SCAN_CONFIG['page_analysis_budget']}s），结果不完整")
+        if elapsed is not None:
+            entry = (elapsed, url, partial)
+            if len(self.slowest) < SCAN_CONFIG["slowest_report_size"]:
+                heapq.heappush(self.slowest, entry)
+            elif self.slowest and entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+        if not vulnerabilities:
+            return
+        self.results[url] = vulnerabilities
+        tqdm.write(f"[!] 在 {url} 发现 {len(vulnerabilities)} 个潜在漏洞")
+        for vuln in vulnerabilities:
+            tqdm.write(f"    - [{vuln['severity']}] {vuln['type']}: {vuln['description']}")
+
+    def finish(self):
+        """等待队列中的页面全部分析完成，返回 {url: [漏洞]}"""
+        self.queue.put(None)
+        self.thread.join()
+        self.progress.close()
+        if self.executor:
+            self.executor.shutdown()
+            stats = _merge_stats(self.worker_stats.values())
+            metrics.merge_stage_counters(stats["stages"], metrics.stage_counters())  # 主进程中的阶段（增量比对）
+        else:
+            stats = _snapshot_stats(self.script_cache, self.findings_cache)
+            if self.script_cache:
+                self.script_cache.close()
+        if stats["stages"]:
+            print_stats("分析阶段耗时（按总耗时排序）", metrics.get_stage_stats(stats["stages"]))
+        if stats["prefilter"]:
+            print_stats("关键字预过滤统计", get_prefilter_stats(stats["prefilter"]))
+        print_stats("检测规则统计（按耗时排序）", get_rule_stats(stats["rules"]))
+        print_stats("最慢的页面", {
+            url: f"{elapsed * 1000:.1f}ms" + (" (超出时间预算，部分结果)" if partial else "")
+            for elapsed, url, partial in sorted(self.slowest, reverse=True)
+        })
+        if self.partial_pages:
+            print(f"[!] {len(self.partial_pages)} 个页面超出分析时间预算（{SCAN_CONFIG['page_analysis_budget']}s），"
+                  f"结果不完整（未计入漏洞，可调大page_analysis_budget后单独扫描）：")
+            for url in self.partial_pages:
+                print(f"    - {url}")
+        if stats["findings"]:
+            print_stats("检测结果缓存统计", FindingsCache.format_stats(stats["findings"]))
+        if stats["scripts"]:
+            print_stats("外部脚本统计", ScriptCache.format_stats(stats["scripts"]))
+        if SCAN_CONFIG["metrics_file"]:
+            stats["slowest_pages"] = [
+                {"url": url, "elapsed_ms": round(elapsed * 1000, 3), "partial": partial}
+                for elapsed, url, partial in sorted(self.slowest, reverse=True)
+            ]
+            stats["partial_pages"] = self.partial_pages
+            metrics.write_metrics(SCAN_CONFIG["metrics_file"], stats)
+            print(f"[*] 分析指标已写入: {SCAN_CONFIG['metrics_file']}")
+        return self.results
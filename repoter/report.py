@@ -297,12 +297,16 @@ class ReportGenerator:
                         <p><strong>严重程度:</strong> <span class="severity-badge badge-{vuln['severity']}">{vuln['severity']}</span></p>
                     </div>
                 """
+                if 'script_url' in vuln:
+                    html += f"<p><strong>来源脚本:</strong> <a class='url' href='{vuln['script_url']}'>{vuln['script_url']}</a></p>"
                 if 'code_snippet' in vuln:
                     html += f"<p><strong>代码片段:</strong></p><div class='code'>{vuln['code_snippet']}</div>"
                 if 'exploit' in vuln and vuln['exploit']['exploitable']:
                     html += f"<p><strong>可利用:</strong> 是</p>"
                     html += f"<p><strong>成功Payload:</strong> <div class='code'>{vuln['exploit']['payload']}</div></p>"
                     html += f"<p><strong>利用证明:</strong> {vuln['exploit']['proof']}</p>"
+                    if vuln['exploit'].get('poc_file'):
+                        html += f"<p><strong>POC文件:</strong> {vuln['exploit']['poc_file']}</p>"
                 if 'fix建议' in vuln:
                     html += f"<div class='fix'><strong>修复建议:</strong> {vuln['fix建议']}</div>"
                 html += "</div>"
@@ -406,12 +410,16 @@ class ReportGenerator:
                 text += f"  类型: {vuln['type']}\n"
                 text += f"  严重程度: {vuln['severity']}\n"
 
+                if 'script_url' in vuln:
+                    text += f"  来源脚本: {vuln['script_url']}\n"
                 if 'code_snippet' in vuln:
                     text += f"  代码片段: {vuln['code_snippet']}\n"
 
                 if 'exploit' in vuln and vuln['exploit']['exploitable']:
                     text += f"  可利用: 是\n"
                     text += f"  成功Payload: {vuln['exploit']['payload']}\n"
+                    if vuln['exploit'].get('poc_file'):
+                        text += f"  POC文件: {vuln['exploit']['poc_file']}\n"
                 else:
                     text += f"  可利用: 否\n"
 
@@ -0,0 +1,47 @@
+import timeit
+import unittest
+from analyzer import metrics
+
+
+class TimerTest(unittest.TestCase):
+    def setUp(self):
+        self.was_enabled = metrics.is_enabled()
+        self.stages = dict(metrics._stages)
+        metrics._stages.clear()
+
+    def tearDown(self):
+        metrics.set_enabled(self.was_enabled)
+        metrics._stages.clear()
+        metrics._stages.update(self.stages)
+
+    def test_disabled_returns_shared_null_timer(self):
+        metrics.set_enabled(False)
+        self.assertIs(metrics.timer("parse_stream"), metrics._NULL_TIMER)
+        self.assertIs(metrics.timer("js_lex"), metrics.timer("parse_stream"))
+        with metrics.timer("parse_stream"):
+            pass
+        self.assertEqual(metrics.stage_counters(), {})
+
+    def test_enabled_records_stage(self):
+        metrics.set_enabled(True)
+        for _ in range(3):
+            with metrics.timer("js_lex"):
+                pass
+        count, elapsed, slowest = metrics.stage_counters()["js_lex"]
+        self.assertEqual(count, 3)
+        self.assertGreaterEqual(elapsed, slowest)
+
+    def test_disabled_overhead_is_bounded(self):
+        """未启用时每次with timer()相对空循环的额外开销在2微秒以内（实际约0.3微秒）"""
+        metrics.set_enabled(False)
+        n = 100000
+        scope = {"timer": metrics.timer, "n": n}
+        bare = min(timeit.repeat("for _ in range(n): pass", globals=scope, number=1, repeat=5))
+        timed = min(timeit.repeat('for _ in range(n):\n    with timer("stage"): pass',
+                                  globals=scope, number=1, repeat=5))
+        self.assertLess((timed - bare) / n, 2e-6)
+        self.assertEqual(metrics.stage_counters(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
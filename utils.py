@@ -1,5 +1,7 @@
 import re
 import hashlib
+import threading
+from collections import OrderedDict
 from urllib.parse import urlparse, urlunparse, quote, unquote
 
 
@@ -38,13 +40,15 @@ def get_url_hash(url):
     normalized = normalize_url(url)
     return hashlib.md5(normalized.encode('utf-8')).hexdigest()
 
-def extract_js_functions(html, function_name):
-    """从HTML中提取指定名称的JavaScript函数体"""
-    pattern = re.compile(
-        rf'{function_name}\s*\([^)]*\)\s*{{([^}}]*)}}',
-        re.IGNORECASE | re.DOTALL
-    )
-    return pattern.findall(html)
+def get_url_fingerprint(normalized_url):
+    """生成已标准化URL的64位整数指纹（调用方负责先标准化，避免重复处理）"""
+    digest = hashlib.blake2b(normalized_url.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def extract_js_functions(js_code, function_name):
+    """从JavaScript代码中提取指定名称的函数定义（词法分析，正确处理嵌套花括号、字符串和注释）"""
+    from analyzer.jslexer import JSSource
+    return JSSource(js_code).functions(function_name)
 
 def escape_payload(payload):
     """对XSS Payload进行URL编码"""
@@ -59,4 +63,49 @@ def html_escape(s):
             .replace("<", "&lt;")
             .replace(">", "&gt;")
             .replace('"', "&quot;")
-            .replace("'", "&#39;"))
\ No newline at end of file
+            .replace("'", "&#39;"))
+
+def print_stats(title, stats):
+    """以对齐的表格形式打印统计数据"""
+    if not stats:
+        return
+    print(f"\n[*] {title}")
+    width = max(len(str(key)) for key in stats)
+    for key, value in stats.items():
+        print(f"    {str(key).ljust(width)} : {value}")
+
+
+class LRUCache:
+    """线程安全的LRU缓存（按条目数限制，超出时淘汰最久未使用的条目）"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.data:
+                return default
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self.lock:
+            return self.data.pop(key, default)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.data
+
+    def __len__(self):
+        return len(self.data)
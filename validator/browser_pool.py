@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import threading
+import time
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+from queue import Queue, Empty
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import NoAlertPresentException
+from config import SCAN_CONFIG
+
+_driver_path = None  # ChromeDriverManager().install()的结果（每次扫描只解析一次）
+_driver_path_lock = threading.Lock()
+PAGE_LOAD_TIMEOUT = 8  # 缩短页面加载超时（默认30秒→8秒）
+
+
+def create_exploit_driver():
+    """启动一个用于漏洞验证的无头浏览器"""
+    global _driver_path
+    chrome_options = Options()
+    # 强制无头模式（无界面，速度提升50%+）
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--log-level=3")  # 关闭冗余日志
+    # 跨站iframe与harness页面同进程，batch模式注入的检测脚本才能作用于iframe中的被测页面
+    chrome_options.add_argument("--disable-site-isolation-trials")
+    chrome_options.add_argument("--disable-features=IsolateOrigins,site-per-process")
+    # 禁用图片加载（进一步提速）
+    prefs = {"profile.managed_default_content_settings.images": 2}
+    chrome_options.add_experimental_option("prefs", prefs)
+
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+    driver = webdriver.Chrome(service=Service(_driver_path), options=chrome_options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    return driver
+
+
+class BrowserWorker:
+    """长期存活的验证浏览器：每次验证使用新标签页，归还时关闭标签页并清除Cookie/存储"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.driver = None
+        self.base_handle = None
+        self.validations = 0
+
+    def start(self):
+        self.driver = create_exploit_driver()
+        self.base_handle = self.driver.current_window_handle
+        self.validations = 0
+
+    def open_tab(self):
+        self.driver.switch_to.new_window('tab')
+        return self.driver
+
+    def reset(self, origins=()):
+        """关闭本次验证的标签页（及其打开的窗口），回到空白的基础窗口，清除本次验证留下的状态"""
+        self.validations += 1
+        for handle in self.driver.window_handles:
+            if handle == self.base_handle:
+                continue
+            self.driver.switch_to.window(handle)
+            self._dismiss_alert()
+            self.driver.close()
+        self.driver.switch_to.window(self.base_handle)
+        # Cookie、localStorage/IndexedDB和缓存在同一浏览器的标签页之间共享，必须显式清除
+        self.driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        self.driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        for origin in origins:
+            self.driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+
+    def _dismiss_alert(self):
+        try:
+            self.driver.switch_to.alert.accept()
+        except NoAlertPresentException:
+            pass
+
+    def quit(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+
+class BrowserPool:
+    """整个扫描期间常驻的验证浏览器池（按需启动，达到验证次数上限或出错时回收重启）
+
+    每个漏洞只借用一个标签页，不再为每个漏洞启动/关闭一次Chrome。
+    """
+
+    def __init__(self, size=1, max_validations_per_browser=None):
+        self.size = size
+        self.max_validations = max_validations_per_browser or SCAN_CONFIG["exploit_max_validations_per_browser"]
+        self.idle = Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+        self.stats = {"sessions": 0, "launches": 0, "launch_failures": 0, "launch_time": 0.0,
+                      "recycles": 0, "resets_failed": 0}
+
+    @contextmanager
+    def session(self, target_url=None):
+        """借用一个浏览器标签页：with pool.session(url) as driver: ...
+
+        浏览器启动失败时driver为None；归还时重置状态（清除target_url所在源的存储），
+        重置失败的浏览器直接丢弃。
+        """
+        worker = self._acquire()
+        try:
+            if not worker.driver:
+                self._launch(worker)
+            driver = worker.open_tab()
+        except Exception as e:
+            # 不只是WebDriverException：ChromeDriverManager离线或无法识别Chrome版本时抛出其他异常，
+            # 浏览器必须归还空闲队列，否则所有浏览器泄漏后_acquire()会永远阻塞
+            print(f"[!] 驱动初始化失败：{str(e)}")
+            worker.quit()
+            self.idle.put(worker)
+            yield None
+            return
+        with self.lock:
+            self.stats["sessions"] += 1
+        try:
+            yield driver
+        finally:
+            try:
+                worker.reset(self._origins(target_url))
+            except Exception:
+                # 浏览器已崩溃或无法清理，丢弃，下次借用时重新启动
+                worker.quit()
+                with self.lock:
+                    self.stats["resets_failed"] += 1
+            if worker.driver and worker.validations >= self.max_validations:
+                worker.quit()
+                with self.lock:
+                    self.stats["recycles"] += 1
+            self.idle.put(worker)
+
+    @staticmethod
+    def _origins(url):
+        parts = urlsplit(url or "")
+        return [f"{parts.scheme}://{parts.netloc}"] if parts.scheme in ("http", "https") and parts.netloc else []
+
+    def _launch(self, worker):
+        start = time.time()
+        try:
+            worker.start()
+        except Exception:
+            with self.lock:
+                self.stats["launch_failures"] += 1
+            raise
+        with self.lock:
+            self.stats["launches"] += 1
+            self.stats["launch_time"] += time.time() - start
+
+    def _acquire(self):
+        """优先复用空闲浏览器，未达上限时新建，否则排队等待"""
+        try:
+            return self.idle.get_nowait()
+        except Empty:
+            pass
+        with self.lock:
+            if len(self.workers) < self.size:
+                worker = BrowserWorker(len(self.workers) + 1)
+                self.workers.append(worker)
+                return worker
+        return self.idle.get()
+
+    def get_stats(self):
+        launches = self.stats["launches"]
+        avg_launch = self.stats["launch_time"] / launches if launches else 0
+        # 不使用浏览器池时，每次验证都要启动一次浏览器
+        saved = max(self.stats["sessions"] - launches, 0) * avg_launch
+        return {
+            "验证浏览器数": f"{len(self.workers)}/{self.size}",
+            "验证次数(借用标签页)": self.stats["sessions"],
+            "浏览器启动次数": launches,
+            "浏览器启动失败": self.stats["launch_failures"],
+            "浏览器回收次数": self.stats["recycles"],
+            "状态重置失败(丢弃浏览器)": self.stats["resets_failed"],
+            "平均启动耗时": f"{avg_launch:.2f}s",
+            "节省的启动时间(估算)": f"{saved:.1f}s",
+        }
+
+    def close(self):
+        for worker in self.workers:
+            worker.quit()
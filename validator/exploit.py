@@ -1,22 +1,53 @@
 import time
-import os
+import re
+import json
 import uuid
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
+from contextlib import contextmanager
 from selenium.webdriver.support.ui import WebDriverWait  # 智能等待
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import (
     NoAlertPresentException, TimeoutException, WebDriverException
 )
 from config import XSS_PAYLOADS, POSTMESSAGE_EXPLOIT_TEMPLATES, SCAN_CONFIG
 from utils import html_escape
+from .browser_pool import create_exploit_driver, PAGE_LOAD_TIMEOUT
+from .poc_server import get_shared_poc_server
+
+# batch模式注入到每个新文档（执行页面自身脚本之前）的检测脚本：只在被测页面（iframe内）生效，
+# 把alert/confirm/prompt/print的调用和含标识的DOM变化上报给harness页面，并在DOM就绪时通知harness
+HOOK_JS = """
+(function () {
+    if (window === window.top) return;
+    function report(how, value) {
+        try { window.top.postMessage({__pmxss: 'hit', how: how, value: String(value)}, '*'); } catch (e) {}
+    }
+    ['alert', 'confirm', 'prompt', 'print'].forEach(function (name) {
+        window[name] = function (value) { report(name, value); return name === 'confirm' ? true : null; };
+    });
+    var marker = /xss_[0-9a-f]{6}_[0-9]+/g;
+    function scan(text) {
+        var found = text && String(text).match(marker);
+        if (found) found.forEach(function (id) { report('dom', id); });
+    }
+    new MutationObserver(function (records) {
+        records.forEach(function (record) {
+            if (record.type === 'attributes') scan(record.target.getAttribute(record.attributeName));
+            else if (record.type === 'characterData') scan(record.target.data);
+            else record.addedNodes.forEach(function (node) { scan(node.outerHTML || node.textContent); });
+        });
+    }).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    document.addEventListener('DOMContentLoaded', function () {
+        window.parent.postMessage({__pmxss: 'ready'}, '*');
+    });
+})();
+"""
 
 
 class PostMessageExploiter:
-    def __init__(self):
+    def __init__(self, browser_pool=None, poc_server=None):
         self.driver = None  # 延迟初始化，避免提前占用资源
+        self.browser_pool = browser_pool  # 扫描期间常驻的浏览器池（None时每次验证单独启动浏览器）
+        self.poc_server = poc_server  # 提供POC页面的本地HTTP服务器（None时使用进程级共享服务器）
         # 优化1：按成功率排序Payload（高成功率的放前面）
         self.sorted_payloads = self._sort_payloads_by_effectiveness()
 
@@ -37,90 +68,183 @@ class PostMessageExploiter:
         if self.driver:
             return self.driver  # 已初始化则直接复用
         try:
-            chrome_options = Options()
-            # 优化2：强制无头模式（无界面，速度提升50%+）
-            chrome_options.add_argument("--headless=new")
-            chrome_options.add_argument("--disable-gpu")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--log-level=3")  # 关闭冗余日志
-            # 禁用图片加载（进一步提速）
-            prefs = {"profile.managed_default_content_settings.images": 2}
-            chrome_options.add_experimental_option("prefs", prefs)
-
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.driver.set_page_load_timeout(8)  # 缩短页面加载超时（默认30秒→8秒）
+            self.driver = create_exploit_driver()
             return self.driver
         except WebDriverException as e:
             print(f"[!] 驱动初始化失败：{str(e)}")
             return None
 
-    def test_vulnerability(self, url, vulnerability):
-        """验证漏洞（复用浏览器，减少重复启动）"""
+    @contextmanager
+    def _browser(self, url):
+        """本次验证使用的浏览器：优先从浏览器池借用标签页，否则单独启动并在验证结束后关闭"""
+        if self.browser_pool:
+            with self.browser_pool.session(url) as driver:
+                self.driver = driver
+                try:
+                    yield driver
+                finally:
+                    self.driver = None  # 标签页已归还浏览器池
+            return
+        try:
+            yield self._init_driver()
+        finally:
+            if self.driver:
+                self.driver.quit()
+                self.driver = None  # 重置，避免下次复用已关闭的实例
+
+    def test_vulnerability(self, url, vulnerability, deadline=None):
+        """验证漏洞（复用浏览器，减少重复启动）；deadline为单个验证任务的时间限制，每次尝试前检查"""
         start_time = time.time()
         result = {"exploitable": False, "payload": "", "proof": ""}
-        self.driver = self._init_driver()  # 初始化/复用浏览器
-        if not self.driver:
-            result["proof"] = "浏览器驱动未初始化"
-            return result
+        with self._browser(url) as driver:  # 借用/启动浏览器，结束时归还或关闭
+            if not driver:
+                result["proof"] = "浏览器驱动未初始化"
+                return result
+
+            try:
+                # 优化3：只测试关键模板（如基础模板+iframe模板，减少冗余模板）
+                test_templates = {
+                    "basic": POSTMESSAGE_EXPLOIT_TEMPLATES["basic"],
+                    "iframe": POSTMESSAGE_EXPLOIT_TEMPLATES.get("iframe", "")
+                }
 
+                # 生成唯一标识（避免误判）
+                test_id = f"xss_{uuid.uuid4().hex[:6]}"
+                # 替换Payload中的标识（便于检测）
+                test_payloads = [p.replace("alert(1)", f"alert('{test_id}')") for p in self.sorted_payloads]
+
+                if SCAN_CONFIG["exploit_mode"] == "batch" and not (deadline and deadline.expired()):
+                    batch_result = self._test_batch(url, test_id, deadline)
+                    if batch_result is not None:
+                        batch_result["time_used"] = f"{time.time() - start_time:.2f}s"
+                        return batch_result
+                    # 目标页禁止被嵌入iframe或harness未就绪：退回逐个Payload加载POC验证
+
+                for payload in test_payloads[:10]:  # 优化4：限制测试数量（前10个高效Payload）
+                    for template_name, template in test_templates.items():
+                        if not template:
+                            continue
+                        if deadline and deadline.expired():
+                            result["proof"] = f"验证超时：超过单个验证任务的时间限制 {deadline.seconds}s"
+                            result["timed_out"] = True
+                            return result
+                        # 生成POC（登记到本地POC服务器，浏览器请求时渲染，不写文件）
+                        poc_url = self._generate_poc(url, template, payload)
+                        try:
+                            # 优化5：智能等待页面加载，替代固定sleep
+                            try:
+                                self.driver.get(poc_url)
+                                # 等待2秒（足够JS执行），替代time.sleep(3)
+                                WebDriverWait(self.driver, 2).until(
+                                    EC.presence_of_element_located(("tag name", "body"))
+                                )
+                            except TimeoutException:
+                                continue  # 页面加载超时，直接跳过
+
+                            # 检测XSS是否触发（弹窗/DOM）
+                            detect_result = self._detect_xss(test_id)
+                            if detect_result["success"]:
+                                result = {
+                                    "exploitable": True,
+                                    "payload": payload,
+                                    "proof": detect_result["proof"],
+                                    "poc_file": self.poc_server.save(poc_url),  # 只保存成功的POC
+                                    "time_used": f"{time.time() - start_time:.2f}s"
+                                }
+                                return result  # 找到有效Payload，立即返回（不再测试其他）
+                        finally:
+                            self.poc_server.release(poc_url)
+
+                # 所有测试完成未发现漏洞
+                result["proof"] = "所有Payload测试均未触发XSS"
+                result["time_used"] = f"{time.time() - start_time:.2f}s"
+                return result
+
+            except Exception as e:
+                result["proof"] = f"验证出错：{str(e)}"
+                return result
+
+    def _test_batch(self, url, test_id, deadline=None):
+        """batch模式：目标页只加载一次，依次发送全部Payload（每个带唯一编号），按上报的编号判断哪些生效
+
+        目标页无法在iframe中加载（未收到就绪消息）或超过deadline时返回None，由调用方退回逐个验证
+        （超时的情况下逐个验证会立即返回超时结果）。
+        """
+        payload_ids = [f"{test_id}_{n}" for n in range(len(self.sorted_payloads))]
+        payloads = [p.replace("alert(1)", f"alert('{payload_id}')")
+                    for p, payload_id in zip(self.sorted_payloads, payload_ids)]
+        poc_url = self._generate_batch_poc(url, payloads)
         try:
-            # 优化3：只测试关键模板（如基础模板+iframe模板，减少冗余模板）
-            test_templates = {
-                "basic": POSTMESSAGE_EXPLOIT_TEMPLATES["basic"],
-                "iframe": POSTMESSAGE_EXPLOIT_TEMPLATES.get("iframe", "")
-            }
-
-            # 生成唯一标识（避免误判）
-            test_id = f"xss_{uuid.uuid4().hex[:6]}"
-            # 替换Payload中的标识（便于检测）
-            test_payloads = [p.replace("alert(1)", f"alert('{test_id}')") for p in self.sorted_payloads]
-
-            for payload in test_payloads[:10]:  # 优化4：限制测试数量（前10个高效Payload）
-                for template_name, template in test_templates.items():
-                    if not template:
-                        continue
-                    # 生成POC
-                    poc_path = self._generate_poc(url, template, payload)
-                    if not poc_path:
-                        continue
-                    poc_url = f"file:///{poc_path.replace(os.sep, '/')}"
-
-                    # 优化5：智能等待页面加载，替代固定sleep
-                    try:
-                        self.driver.get(poc_url)
-                        # 等待2秒（足够JS执行），替代time.sleep(3)
-                        WebDriverWait(self.driver, 2).until(
-                            EC.presence_of_element_located(("tag name", "body"))
-                        )
-                    except TimeoutException:
-                        continue  # 页面加载超时，直接跳过
-
-                    # 检测XSS是否触发（弹窗/DOM）
-                    detect_result = self._detect_xss(test_id)
-                    if detect_result["success"]:
-                        result = {
-                            "exploitable": True,
-                            "payload": payload,
-                            "proof": detect_result["proof"],
-                            "time_used": f"{time.time() - start_time:.2f}s"
-                        }
-                        return result  # 找到有效Payload，立即返回（不再测试其他）
-
-            # 所有测试完成未发现漏洞
-            result["proof"] = "所有Payload测试均未触发XSS"
-            result["time_used"] = f"{time.time() - start_time:.2f}s"
+            hits = self._run_batch(poc_url, len(payloads), deadline)
+            if hits is None:
+                return None
+            result = self._batch_result(test_id, payload_ids, payloads, hits)
+            if result["exploitable"]:
+                result["poc_file"] = self.poc_server.save(poc_url)  # 只保存成功的harness页面
             return result
+        finally:
+            self.poc_server.release(poc_url)
 
-        except Exception as e:
-            result["proof"] = f"验证出错：{str(e)}"
-            return result
+    def _run_batch(self, poc_url, count, deadline=None):
+        """加载harness页面并等待全部Payload发送完成，返回上报的 [(方式, 值)]；目标页未就绪时返回None
+
+        页面加载超时、等待发送完成和等待异步Payload的时间都不超过deadline的剩余时间。
+        """
+        remaining = deadline.remaining() if deadline else None
+
+        def capped(seconds):
+            return seconds if remaining is None else min(seconds, remaining)
+
+        # 检测脚本只注册在当前标签页上，结束后移除（退回逐个验证时需要真实的弹窗）
+        hook = self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": HOOK_JS})
+        page_load_timeout = capped(PAGE_LOAD_TIMEOUT)
+        if page_load_timeout < PAGE_LOAD_TIMEOUT:
+            self.driver.set_page_load_timeout(page_load_timeout)
+        try:
+            send_time = count * SCAN_CONFIG["exploit_batch_interval_ms"] / 1000
+            try:
+                self.driver.get(poc_url)
+                state = WebDriverWait(self.driver, capped(PAGE_LOAD_TIMEOUT + send_time)).until(
+                    lambda d: d.execute_script(
+                        "return ['sent', 'blocked'].includes(window.__pmxss && __pmxss.state) && __pmxss.state")
+                )
+            except TimeoutException:
+                return None
+            if state == "blocked":
+                return None
+            # 等待异步执行的Payload（如setTimeout、图片onerror）
+            time.sleep(capped(SCAN_CONFIG["exploit_batch_settle"]))
+            return self.driver.execute_script("return window.__pmxss.hits")
         finally:
-            # 优化6：最后统一关闭浏览器（而非每次测试关闭）
-            if hasattr(self, 'driver') and self.driver:
-                self.driver.quit()
-                self.driver = None  # 重置，避免下次复用已关闭的实例
+            if page_load_timeout < PAGE_LOAD_TIMEOUT:
+                self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)  # 浏览器/标签页会被后续任务复用
+            self.driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": hook["identifier"]})
+
+    @staticmethod
+    def _batch_result(test_id, payload_ids, payloads, hits):
+        """把上报的编号对应回Payload，生成验证结果"""
+        # 编号 -> 生效方式：执行（弹窗等）优先于DOM中出现标识
+        marker = re.compile(re.escape(test_id) + r"_(\d+)")
+        executed = {}
+        for how, value in hits:
+            for number in marker.findall(value):
+                index = int(number)
+                if index < len(payloads) and executed.get(index, "dom") == "dom":
+                    executed[index] = how
+        if not executed:
+            return {"exploitable": False, "payload": "",
+                    "proof": f"所有Payload测试均未触发XSS（单次加载发送 {len(payloads)} 个Payload）"}
+
+        # 取排序最靠前（成功率最高）的生效Payload，有执行的优先
+        index = min(executed, key=lambda i: (executed[i] == "dom", i))
+        how = executed[index]
+        proof = f"DOM中找到标识：{payload_ids[index]}" if how == "dom" else f"触发弹窗({how})：{payload_ids[index]}"
+        return {
+            "exploitable": True,
+            "payload": payloads[index],
+            "proof": f"{proof}（{len(executed)}/{len(payloads)} 个Payload生效）",
+            "effective_payloads": [payloads[i] for i in sorted(executed)],
+        }
 
     def _detect_xss(self, test_id):
         """快速检测XSS（优先查弹窗，再查DOM）"""
@@ -146,22 +270,18 @@ class PostMessageExploiter:
         return {"success": False, "proof": ""}
 
     def _generate_poc(self, target_url, template, payload):
-        """简化POC生成逻辑，减少IO操作耗时"""
-        try:
-            escaped_url = html_escape(target_url)
-            escaped_payload = html_escape(payload)
-            poc_content = template.format(target_url=escaped_url, xss_payload=escaped_payload)
-            if not poc_content.strip():
-                return None
+        """登记POC到本地POC服务器（只在内存中，浏览器请求时渲染），返回POC的URL"""
+        escaped_url = html_escape(target_url)
+        escaped_payload = html_escape(payload)
+        return self._add_poc(template, target_url=escaped_url, xss_payload=escaped_payload)
+
+    def _generate_batch_poc(self, target_url, payloads):
+        """登记batch模式的harness页面（Payload以JSON数组嵌入，转义<避免提前闭合script标签）"""
+        payloads_json = json.dumps(payloads).replace("<", "\\u003c")
+        return self._add_poc(POSTMESSAGE_EXPLOIT_TEMPLATES["batch"], target_url=html_escape(target_url),
+                             payloads_json=payloads_json, interval_ms=SCAN_CONFIG["exploit_batch_interval_ms"])
 
-            # 优化：使用临时目录，减少磁盘IO（可选）
-            exploit_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "exploits")
-            os.makedirs(exploit_dir, exist_ok=True)
-            poc_path = os.path.join(exploit_dir, f"poc_{uuid.uuid4().hex[:6]}.html")
-
-            with open(poc_path, "w", encoding="utf-8") as f:
-                f.write(poc_content)
-            return poc_path
-        except Exception as e:
-            print(f"[!] POC生成失败：{e}")
-            return None
\ No newline at end of file
+    def _add_poc(self, template, **fields):
+        if self.poc_server is None:
+            self.poc_server = get_shared_poc_server()
+        return self.poc_server.add(template, **fields)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import os
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import SCAN_CONFIG
+
+# 成功的POC保存目录（作为漏洞证据）
+EXPLOIT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "exploits")
+
+
+class _PocHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content = self.server.poc_server.render(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        with self.server.poc_server.lock:
+            self.server.poc_server.stats["served"] += 1
+        body = content.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不输出访问日志
+
+
+class PocServer:
+    """本地回环HTTP服务器：POC只保存在内存中，浏览器请求时按模板渲染
+
+    POC来自真实的 http://127.0.0.1:<port> 源（而不是file:///的不透明源），与真实的跨源攻击者
+    一致；每次尝试结束后即释放，只有验证成功的POC才通过save()写入exploits目录。
+    """
+
+    def __init__(self, port=None):
+        self.port = SCAN_CONFIG["poc_server_port"] if port is None else port
+        self.pocs = {}  # 路径 -> (模板, 模板参数)
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.base_url = None
+        self.stats = {"served": 0, "saved": 0}
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", self.port), _PocHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.poc_server = self
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, name="poc-server", daemon=True).start()
+        return self
+
+    def add(self, template, **fields):
+        """登记一个POC（不渲染、不写文件），返回其URL"""
+        path = f"/poc/{uuid.uuid4().hex}.html"
+        with self.lock:
+            self.pocs[path] = (template, fields)
+        return self.base_url + path
+
+    def render(self, path):
+        with self.lock:
+            poc = self.pocs.get(path.split("?", 1)[0])
+        if poc is None:
+            return None
+        template, fields = poc
+        return template.format(**fields)
+
+    def release(self, url):
+        """本次尝试结束，丢弃POC"""
+        with self.lock:
+            self.pocs.pop(url[len(self.base_url):], None)
+
+    def save(self, url):
+        """把验证成功的POC写入exploits目录，返回文件路径"""
+        content = self.render(url[len(self.base_url):])
+        if content is None:
+            return None
+        os.makedirs(EXPLOIT_DIR, exist_ok=True)
+        poc_path = os.path.join(EXPLOIT_DIR, f"poc_{uuid.uuid4().hex[:6]}.html")
+        with open(poc_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        with self.lock:
+            self.stats["saved"] += 1
+        return poc_path
+
+    def close(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+_shared_server = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_poc_server():
+    """未指定POC服务器时使用的进程级共享服务器（首次使用时启动，随进程退出）"""
+    global _shared_server
+    with _shared_lock:
+        if _shared_server is None:
+            _shared_server = PocServer().start()
+        return _shared_server
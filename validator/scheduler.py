@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from tqdm import tqdm
+from analyzer.deadline import Deadline
+from config import SCAN_CONFIG
+from .browser_pool import BrowserPool
+from .exploit import PostMessageExploiter
+from .poc_server import PocServer
+
+# 验证顺序：高危漏洞优先，同一等级内保持页面的发现顺序
+SEVERITY_ORDER = {"high": 0, "medium": 1, "low": 2, "info": 3}
+
+
+class ValidationScheduler:
+    """把漏洞验证任务分配给N个浏览器工作者并行执行
+
+    任务按严重程度排序后依次提交（线程池按提交顺序取任务，高危漏洞最先验证）；每个任务
+    从浏览器池借用独立的标签页，并有单独的时间限制（在每次Payload尝试前检查，超时的任务
+    返回未验证结果，增量模式下不保存，下次重新验证）。验证结果写回results[url][i]['exploit']。
+
+    模板化站点的大量页面包含同一个message处理函数：按(处理函数指纹, 漏洞类型)分组后，
+    每组只验证一个（最多validate_group_representatives个）代表页面，验证结论连同来源说明
+    沿用到组内其余页面，验证耗时随不同处理函数的数量而不是页面数量增长。
+    """
+
+    def __init__(self, workers=None, job_timeout=None, incremental=None, dedup=None):
+        self.workers = max(workers or SCAN_CONFIG["validate_workers"], 1)
+        self.job_timeout = job_timeout if job_timeout is not None else SCAN_CONFIG["validate_job_timeout"]
+        self.incremental = incremental
+        self.dedup = SCAN_CONFIG["validate_dedup"] if dedup is None else dedup
+        self.representatives = max(SCAN_CONFIG["validate_group_representatives"], 1)
+        self.browser_pool = BrowserPool(size=self.workers)
+        self.poc_server = None  # 验证开始时启动，所有工作者共用
+        self.stats = {"jobs": 0, "reused": 0, "exploitable": 0, "timeouts": 0, "errors": 0, "elapsed": 0.0,
+                      "groups": 0, "propagated": 0}
+
+    def _jobs(self, results):
+        jobs = [(url, i, vuln) for url, vulns in results.items() for i, vuln in enumerate(vulns)]
+        return sorted(jobs, key=lambda job: SEVERITY_ORDER.get(job[2].get("severity"), len(SEVERITY_ORDER)))
+
+    def _groups(self, jobs):
+        """按(处理函数指纹, 漏洞类型)分组（保持严重程度顺序）；没有处理函数指纹的漏洞单独成组"""
+        groups = {}
+        for url, i, vuln in jobs:
+            if self.dedup and "handler_fingerprint" in vuln:
+                key = (vuln["handler_fingerprint"], vuln["type"])
+            else:
+                key = (url, i)
+            groups.setdefault(key, _Group()).members.append((url, i, vuln))
+        return list(groups.values())
+
+    def _validate(self, url, vuln):
+        """在工作线程中执行：时间限制从任务开始执行时计算（不含排队时间）"""
+        exploiter = PostMessageExploiter(browser_pool=self.browser_pool, poc_server=self.poc_server)
+        return exploiter.test_vulnerability(url, vuln, deadline=Deadline(self.job_timeout))
+
+    def run(self, results):
+        """验证results中的所有漏洞，可利用的漏洞写入results[url][i]['exploit']"""
+        start = time.time()
+        jobs = self._jobs(results)
+        self.poc_server = PocServer().start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                    tqdm(total=len(jobs), desc="验证漏洞") as progress:
+                fresh = []
+                for url, i, vuln in jobs:
+                    # 增量模式：同一处理函数/调用上次已验证过，直接复用验证结果
+                    exploit_result = self.incremental.lookup_validation(url, vuln) if self.incremental else None
+                    if exploit_result is None:
+                        fresh.append((url, i, vuln))
+                    else:
+                        self.stats["reused"] += 1
+                        self._merge(results, url, i, exploit_result)
+                        progress.update()
+
+                groups = self._groups(fresh)
+                self.stats["groups"] = len(groups)
+                futures = {}
+
+                def submit(group):
+                    job = group.members[group.next]
+                    group.next += 1
+                    futures[executor.submit(self._validate, job[0], job[2])] = (group, job)
+
+                for group in groups:
+                    submit(group)
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        group, (url, i, vuln) = futures.pop(future)
+                        try:
+                            exploit_result = future.result()
+                        except Exception as e:
+                            self.stats["errors"] += 1
+                            tqdm.write(f"[!] 验证 {url} 出错：{e}")
+                            exploit_result = None
+                        self._complete(results, url, i, vuln, exploit_result)
+                        progress.update()
+                        group.record(url, exploit_result)
+                        if group.next < len(group.members) and group.needs_more(self.representatives):
+                            submit(group)
+                        else:
+                            self._propagate(results, group, progress)
+        finally:
+            self.browser_pool.close()
+            self.poc_server.close()
+            self.stats["elapsed"] = time.time() - start
+        return results
+
+    def _complete(self, results, url, i, vuln, exploit_result):
+        self.stats["jobs"] += 1
+        if exploit_result and exploit_result.get("timed_out"):
+            self.stats["timeouts"] += 1
+        # time_used只在验证完整执行后才有（浏览器启动失败、出错或超时时不保存，下次重新验证）
+        if self.incremental and exploit_result and 'time_used' in exploit_result:
+            self.incremental.store_validation(url, vuln, exploit_result)
+        self._merge(results, url, i, exploit_result)
+
+    def _propagate(self, results, group, progress):
+        """把代表页面的验证结论沿用到组内未验证的页面（没有结论时这些页面保持未验证）"""
+        for url, i, vuln in group.members[group.next:]:
+            if group.verdict:
+                source_url, source_result = group.verdict
+                exploit_result = dict(source_result, propagated_from=source_url,
+                                      proof=f"{source_result['proof']}（沿用 {source_url} 的验证结果：相同的message处理函数）")
+                self.stats["propagated"] += 1
+                if self.incremental:
+                    self.incremental.store_validation(url, vuln, exploit_result)
+                self._merge(results, url, i, exploit_result)
+            progress.update()
+        group.next = len(group.members)
+
+    def _merge(self, results, url, i, exploit_result):
+        if exploit_result and exploit_result['exploitable']:
+            results[url][i]['exploit'] = exploit_result
+            self.stats["exploitable"] += 1
+            tqdm.write(f"[!] 已验证 {url} 存在可利用漏洞")
+
+    def get_stats(self):
+        return {
+            "并行验证浏览器数": self.workers,
+            "执行的验证任务": self.stats["jobs"],
+            "复用的验证结果": self.stats["reused"],
+            "验证分组数(处理函数+漏洞类型)": self.stats["groups"],
+            "沿用组内验证结论": self.stats["propagated"],
+            "确认可利用": self.stats["exploitable"],
+            "超时任务": f"{self.stats['timeouts']}（单任务限时 {self.job_timeout}s）",
+            "出错任务": self.stats["errors"],
+            "POC请求数(内存中渲染)": self.poc_server.stats["served"] if self.poc_server else 0,
+            "保存的成功POC": self.poc_server.stats["saved"] if self.poc_server else 0,
+            "验证总耗时": f"{self.stats['elapsed']:.1f}s",
+        }
+
+
+class _Group:
+    """一组相同处理函数+漏洞类型的验证任务：已提交到第next个成员，verdict为(代表URL, 验证结果)"""
+
+    def __init__(self):
+        self.members = []
+        self.next = 0
+        self.conclusive = 0  # 得出结论（验证完整执行）的代表数
+        self.verdict = None
+
+    def record(self, url, exploit_result):
+        if not exploit_result or 'time_used' not in exploit_result:
+            return  # 浏览器启动失败、出错或超时：没有结论，换下一个页面验证
+        self.conclusive += 1
+        if self.verdict is None or (exploit_result['exploitable'] and not self.verdict[1]['exploitable']):
+            self.verdict = (url, exploit_result)
+
+    def needs_more(self, representatives):
+        """已确认可利用，或已有足够多的代表得出结论时，不再验证组内其他页面"""
+        if self.verdict and self.verdict[1]['exploitable']:
+            return False
+        return self.conclusive < representatives